@@ -0,0 +1,125 @@
+# ocr_app/autoscale.py
+# تصمیم‌گیری تعداد پردازه‌های ocr_worker براساس طول صف اسکن و عمر قدیمی‌ترین آیتم در
+# انتظار (manage.py ocr_autoscale). افزایش سریع و کاهش با تأخیر (hysteresis) تا بار
+# لحظه‌ای باعث ساخت و حذف پشت‌سرهم workerها نشود؛ افزایش فقط وقتی پردازنده و حافظه‌ی
+# آزاد کافی باشد.
+import math
+import os
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ScanQueue
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_AUTOSCALE_SETTINGS = {
+    'min_workers': 1,
+    'max_workers': os.cpu_count() or 1,
+    # تعداد آیتم‌های صف (در انتظار و در حال پردازش) به ازای هر worker
+    'items_per_worker': 10,
+    # اگر قدیمی‌ترین آیتم بیش از این (ثانیه) منتظر مانده باشد، یک worker اضافه می‌شود
+    'max_wait_seconds': 120,
+    # حداکثر تعداد workerهای اضافه‌شده در هر تصمیم
+    'scale_up_step': 2,
+    # فاصله‌ی حداقل بین دو افزایش، و مدتی که نیاز کمتر باید پایدار بماند تا یک worker کم شود
+    'scale_up_cooldown': 30,
+    'scale_down_delay': 300,
+    # محافظ‌ها: بدون پردازنده‌ی آزاد یا حافظه‌ی کافی برای بارگذاری مدل‌ها worker اضافه نمی‌شود
+    'max_cpu_percent': 90,
+    'min_available_memory_mb': 1024,
+    'interval': 10,
+    # نخ‌های torch هر worker (None = پیش‌فرض torch)
+    'threads_per_worker': None,
+}
+
+
+def autoscale_settings():
+    options = dict(DEFAULT_AUTOSCALE_SETTINGS)
+    options.update(getattr(settings, 'OCR_AUTOSCALE', {}))
+    return options
+
+
+def queue_metrics(now=None):
+    """طول صف: {'pending', 'processing', 'oldest_wait'} (عمر قدیمی‌ترین آیتم در انتظار به ثانیه)"""
+    now = now or timezone.now()
+    pending = ScanQueue.objects.filter(status='pending')
+    oldest = pending.order_by('created_at').values_list('created_at', flat=True).first()
+    return {
+        'pending': pending.count(),
+        'processing': ScanQueue.objects.filter(status='processing', lease_expires_at__gte=now).count(),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+def system_metrics():
+    """بار پردازنده (درصد) و حافظه‌ی آزاد (مگابایت)؛ بدون psutil هر دو None"""
+    if psutil is None:
+        return {'cpu_percent': None, 'available_memory_mb': None}
+    return {
+        'cpu_percent': psutil.cpu_percent(interval=None),
+        'available_memory_mb': psutil.virtual_memory().available / (1024 * 1024),
+    }
+
+
+class AutoscalePolicy:
+    """تعداد هدف workerها در هر بررسی: decide(current, queue, system) -> (تعداد جدید، دلیل)"""
+
+    def __init__(self, options=None, clock=time.monotonic):
+        self.options = options or autoscale_settings()
+        self.clock = clock
+        self.last_scale_up = None
+        self.low_since = None
+
+    def desired(self, current, queue):
+        """نیاز خام براساس طول صف و زمان انتظار (بدون hysteresis و محافظ‌ها)"""
+        options = self.options
+        desired = math.ceil((queue['pending'] + queue['processing']) / options['items_per_worker'])
+        if queue['pending'] and queue['oldest_wait'] > options['max_wait_seconds']:
+            desired = max(desired, current + 1)
+        return max(options['min_workers'], min(options['max_workers'], desired))
+
+    def decide(self, current, queue, system):
+        options = self.options
+        now = self.clock()
+        desired = self.desired(current, queue)
+        memory = system['available_memory_mb']
+        cpu = system['cpu_percent']
+
+        if current < options['min_workers']:
+            return options['min_workers'], f'کمتر از حداقل ({options["min_workers"]})'
+
+        # کمبود شدید حافظه: یک worker کم می‌شود حتی اگر صف پر باشد
+        if memory is not None and memory < options['min_available_memory_mb'] / 2 and current > options['min_workers']:
+            self.low_since = None
+            return current - 1, f'حافظه‌ی آزاد بسیار کم ({memory:.0f} MB)'
+
+        if desired > current:
+            self.low_since = None
+            if self.last_scale_up is not None and now - self.last_scale_up < options['scale_up_cooldown']:
+                return current, None
+            if cpu is not None and cpu > options['max_cpu_percent']:
+                return current, f'افزایش لازم است ({desired}) اما پردازنده مشغول است ({cpu:.0f}%)'
+            if memory is not None and memory < options['min_available_memory_mb']:
+                return current, f'افزایش لازم است ({desired}) اما حافظه‌ی آزاد کافی نیست ({memory:.0f} MB)'
+            self.last_scale_up = now
+            target = min(desired, current + options['scale_up_step'])
+            return target, (f'در انتظار: {queue["pending"]}، در حال پردازش: {queue["processing"]}، '
+                            f'قدیمی‌ترین انتظار: {queue["oldest_wait"]:.0f}s')
+
+        if desired < current:
+            # کاهش فقط وقتی نیاز کمتر برای scale_down_delay ثانیه پایدار بماند، و هر بار یک worker
+            if self.low_since is None:
+                self.low_since = now
+                return current, None
+            if now - self.low_since < options['scale_down_delay']:
+                return current, None
+            self.low_since = now
+            return current - 1, f'صف کوتاه (در انتظار: {queue["pending"]}) برای {options["scale_down_delay"]}s'
+
+        self.low_since = None
+        return current, None
@@ -0,0 +1,116 @@
+# ocr_app/docx_reader.py
+# خواندن جریانی متن فایل‌های docx بدون ساختن مدل کامل python-docx:
+# بخش‌های XML مستقیماً از فایل zip با iterparse خوانده می‌شوند و هر پاراگراف
+# پس از استفاده از درخت حذف می‌شود، پس حافظه به اندازه‌ی فایل وابسته نیست.
+import re
+import zipfile
+from xml.etree import ElementTree
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_NS = '{http://schemas.openxmlformats.org/markup-compatibility/2006}'
+
+_P = W_NS + 'p'
+_T = W_NS + 't'
+_TAB = W_NS + 'tab'
+_BR = W_NS + 'br'
+_CR = W_NS + 'cr'
+_TBL = W_NS + 'tbl'
+_TC = W_NS + 'tc'
+_V_MERGE = W_NS + 'vMerge'
+_VAL = W_NS + 'val'
+_FALLBACK = MC_NS + 'Fallback'
+
+# متن عناصر درون run (متن w:t از خود عنصر خوانده می‌شود)
+_RUN_TEXT = {_T: None, _TAB: '\t', _BR: '\n', _CR: '\n'}
+
+# عناصری که بعد از پایان، از والد خود جدا می‌شوند تا درخت بزرگ نشود
+_BLOCKS = (_P, _TBL)
+
+_HEADER_PART = re.compile(r'^word/header\d*\.xml$')
+_FOOTER_PART = re.compile(r'^word/footer\d*\.xml$')
+
+
+def _part_key(name):
+    """مرتب‌سازی طبیعی header1, header2, ..., header10"""
+    number = re.search(r'(\d+)\.xml$', name)
+    return int(number.group(1)) if number else 0
+
+
+def docx_parts(archive):
+    """بخش‌های متنی به ترتیب: سربرگ‌ها، بدنه‌ی سند، پانویس‌های صفحه"""
+    names = archive.namelist()
+    headers = sorted((name for name in names if _HEADER_PART.match(name)), key=_part_key)
+    footers = sorted((name for name in names if _FOOTER_PART.match(name)), key=_part_key)
+    return headers + ['word/document.xml'] + footers
+
+
+def iter_part_blocks(stream):
+    """پاراگراف‌ها و سلول‌های جدول یک بخش XML به ترتیب سند
+
+    سلول‌های ادغام‌شده‌ی عمودی (vMerge بدون restart) متن ندارند و تکرار نمی‌شوند؛
+    ادغام افقی (gridSpan) هم در XML فقط یک سلول است. پاراگراف‌های جعبه‌ی متن (txbxContent
+    درون یک run) پس از پاراگرافی که جعبه در آن است برگردانده می‌شوند و نسخه‌ی جایگزین
+    mc:Fallback همان جعبه نادیده گرفته می‌شود.
+    """
+    stack = []
+    # پاراگراف‌ها و سلول‌های باز به ترتیب تودرتویی: [تگ، متن runها، بلوک‌های درونی، ادامه‌ی ادغام بودن]
+    containers = []
+    # عمق درون mc:Fallback
+    fallback = 0
+
+    for event, elem in ElementTree.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            stack.append(elem)
+            if tag == _FALLBACK:
+                fallback += 1
+            elif not fallback and tag in (_P, _TC):
+                containers.append([tag, [], [], False])
+            continue
+
+        stack.pop()
+        if fallback:
+            if tag == _FALLBACK:
+                fallback -= 1
+                elem.clear()
+            continue
+
+        blocks = None
+        if tag in _RUN_TEXT:
+            if containers and containers[-1][0] == _P:
+                containers[-1][1].append((elem.text or '') if tag == _T else _RUN_TEXT[tag])
+        elif tag == _V_MERGE:
+            if containers and containers[-1][0] == _TC and elem.get(_VAL, 'continue') != 'restart':
+                containers[-1][3] = True
+        elif tag == _P:
+            _, runs, inner, _ = containers.pop()
+            blocks = [''.join(runs)] + inner
+        elif tag == _TC:
+            _, _, paragraphs, merged = containers.pop()
+            text = '\n'.join(paragraph for paragraph in paragraphs if paragraph.strip())
+            blocks = [] if merged else [text]
+
+        if blocks is not None:
+            if containers:
+                # پاراگراف یا جدول تودرتو: متن در پاراگراف یا سلول بیرونی قرار می‌گیرد
+                containers[-1][2].extend(blocks)
+            else:
+                for block in blocks:
+                    if block.strip():
+                        yield block
+
+        if tag in _BLOCKS or tag == _TC:
+            elem.clear()
+            if stack and tag in _BLOCKS:
+                stack[-1].remove(elem)
+
+
+def iter_docx_text(docx_path):
+    """متن سربرگ‌ها، بدنه و پانویس‌ها به صورت جریانی (generator)"""
+    with zipfile.ZipFile(docx_path) as archive:
+        names = set(archive.namelist())
+        for part in docx_parts(archive):
+            if part not in names:
+                continue
+            with archive.open(part) as stream:
+                yield from iter_part_blocks(stream)
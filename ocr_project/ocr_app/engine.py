@@ -0,0 +1,49 @@
+# ocr_app/engine.py
+import threading
+
+from django.conf import settings
+
+# موتور OCR فقط در اولین استفاده ساخته می‌شود تا runserver، migrate و سایر دستورات
+# مدل‌های EasyOCR/torch، OpenCV و PyMuPDF را بی‌دلیل بارگذاری نکنند
+_engine = None
+_engine_error = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine():
+    """موتور OCR مشترک (ساخت تنبل و thread-safe)؛ در صورت نبود کتابخانه‌ها None"""
+    global _engine, _engine_error
+    if _engine is not None or _engine_error is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None and _engine_error is None:
+            service = getattr(settings, 'OCR_SERVICE', {})
+            if service.get('enabled'):
+                # سرویس OCR ماندگار: این پردازه فقط کلاینت است و مدلی بارگذاری نمی‌کند
+                from .ocr_service import OCRServiceClient
+
+                client = OCRServiceClient(service['socket'], service.get('timeout', 600))
+                if client.ping():
+                    _engine = client
+                    print(f"✅ اتصال به سرویس OCR برقرار شد: {service['socket']}")
+                    return _engine
+                print(f"⚠️ سرویس OCR در {service['socket']} در دسترس نیست")
+                if not service.get('fallback_local', True):
+                    _engine_error = ConnectionError('سرویس OCR در دسترس نیست')
+                    return None
+
+            try:
+                from .universal_ocr import UniversalOCR
+
+                _engine = UniversalOCR(**getattr(settings, 'OCR_ENGINE_OPTIONS', {}))
+                print("✅ UniversalOCR با موفقیت لود شد")
+            except ImportError as e:
+                print(f"❌ خطا در لود OCR: {e}")
+                _engine_error = e
+    return _engine
+
+
+def is_engine_loaded():
+    """آیا موتور OCR در این پردازه ساخته شده است"""
+    return _engine is not None
@@ -0,0 +1,59 @@
+# management/commands/check_web_startup.py
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# کتابخانه‌هایی که نباید هنگام راه‌اندازی لایه‌ی وب بارگذاری شوند
+HEAVY_MODULES = ['torch', 'easyocr', 'cv2', 'fitz']
+
+# راه‌اندازی لایه‌ی وب در یک پردازه‌ی تازه: تنظیمات، اپ‌ها، برنامه‌ی WSGI و تمام viewها
+STARTUP_SCRIPT = '''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ocr_project.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+import ocr_project.urls
+import ocr_app.views
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure web tier startup time and verify OCR libraries are not loaded at import'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=None,
+                            help='Startup time budget in seconds (default: settings.OCR_WEB_STARTUP_BUDGET)')
+        parser.add_argument('--runs', type=int, default=3, help='Number of cold starts to measure')
+
+    def handle(self, *args, **options):
+        budget = options['budget'] or getattr(settings, 'OCR_WEB_STARTUP_BUDGET', 3.0)
+        timings = []
+        loaded = set()
+
+        for _ in range(max(1, options['runs'])):
+            completed = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT],
+                cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                raise CommandError(f'خطا در راه‌اندازی: {completed.stderr.strip()}')
+
+            report = json.loads(completed.stdout.strip().splitlines()[-1])
+            timings.append(report['seconds'])
+            loaded.update(m for m in HEAVY_MODULES if m in report['modules'])
+
+        best = min(timings)
+        self.stdout.write(f'⏱️ زمان راه‌اندازی لایه‌ی وب: {best:.2f} ثانیه (بودجه: {budget:.2f} ثانیه)')
+
+        if loaded:
+            raise CommandError(f'کتابخانه‌های سنگین هنگام راه‌اندازی بارگذاری شده‌اند: {", ".join(sorted(loaded))}')
+        if best > budget:
+            raise CommandError(f'زمان راه‌اندازی از بودجه‌ی {budget:.2f} ثانیه بیشتر است')
+
+        self.stdout.write(self.style.SUCCESS('✅ راه‌اندازی لایه‌ی وب در محدوده‌ی مجاز است'))
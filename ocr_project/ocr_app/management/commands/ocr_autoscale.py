@@ -0,0 +1,120 @@
+# management/commands/ocr_autoscale.py
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ocr_app.autoscale import AutoscalePolicy, autoscale_settings, queue_metrics, system_metrics
+from ocr_app.scan_queue import new_worker_id
+
+
+class Command(BaseCommand):
+    help = 'Run ocr_worker processes and scale them with scan queue depth and wait time'
+
+    def add_arguments(self, parser):
+        options = autoscale_settings()
+        parser.add_argument('--min', type=int, default=options['min_workers'], help='Minimum worker processes')
+        parser.add_argument('--max', type=int, default=options['max_workers'], help='Maximum worker processes')
+        parser.add_argument('--interval', type=float, default=options['interval'],
+                            help='Seconds between queue checks')
+
+    def handle(self, *args, **options):
+        scale_options = autoscale_settings()
+        scale_options['min_workers'] = options['min']
+        scale_options['max_workers'] = max(options['min'], options['max'])
+        self.options = scale_options
+        self.policy = AutoscalePolicy(scale_options)
+        self.supervisor_id = new_worker_id()
+        self.workers = []  # [(worker_id, Popen)] به ترتیب راه‌اندازی
+        self.draining = []  # workerهایی که SIGTERM گرفته‌اند و کار جاری را تمام می‌کنند
+        self.sequence = 0
+        self.stopping = False
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🚀 مقیاس‌دهی خودکار workerهای OCR ({scale_options["min_workers"]} تا {scale_options["max_workers"]})'
+        ))
+        system_metrics()  # اولین cpu_percent همیشه 0 است
+
+        try:
+            while not self.stopping:
+                self.reap()
+                try:
+                    close_old_connections()
+                    queue = queue_metrics()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'❌ خطا در خواندن وضعیت صف: {e}'))
+                else:
+                    current = len(self.workers)
+                    target, reason = self.policy.decide(current, queue, system_metrics())
+                    if target != current:
+                        self.log_decision(current, target, reason)
+                        self.scale_to(target)
+                    elif reason:
+                        self.log(f'⏸️ {reason}')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.WARNING('⏹️ توقف همه‌ی workerها پس از پایان کار جاری...'))
+        self.scale_to(0)
+        for worker_id, process in self.draining:
+            process.wait()
+        self.reap()
+
+    def log(self, message):
+        self.stdout.write(f'[{time.strftime("%H:%M:%S")}] {message}')
+
+    def log_decision(self, current, target, reason):
+        arrow = '⬆️' if target > current else '⬇️'
+        self.log(f'{arrow} workerها: {current} → {target} ({reason})')
+
+    def worker_command(self, worker_id):
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'ocr_worker',
+                   '--worker-id', worker_id]
+        if self.options['threads_per_worker']:
+            command += ['--threads', str(self.options['threads_per_worker'])]
+        return command
+
+    def reap(self):
+        """حذف workerهایی که خودشان متوقف شده‌اند (جایگزینی در تصمیم بعدی انجام می‌شود)"""
+        alive = []
+        for worker_id, process in self.workers:
+            code = process.poll()
+            if code is None:
+                alive.append((worker_id, process))
+            else:
+                self.log(f'⚠️ worker {worker_id} با کد {code} پایان یافت')
+        self.workers = alive
+
+        draining = []
+        for worker_id, process in self.draining:
+            if process.poll() is None:
+                draining.append((worker_id, process))
+            else:
+                self.log(f'✅ worker {worker_id} متوقف شد')
+        self.draining = draining
+
+    def scale_to(self, target):
+        while len(self.workers) < target:
+            self.sequence += 1
+            worker_id = f'{self.supervisor_id}-{self.sequence}'
+            process = subprocess.Popen(self.worker_command(worker_id))
+            self.workers.append((worker_id, process))
+            self.log(f'👷 worker {worker_id} راه‌اندازی شد (pid {process.pid})')
+
+        # جدیدترین workerها اول متوقف می‌شوند؛ SIGTERM کار جاری را تمام و سپس متوقف می‌کند
+        while len(self.workers) > target:
+            worker_id, process = self.workers.pop()
+            process.send_signal(signal.SIGTERM)
+            self.draining.append((worker_id, process))
+            self.log(f'⏳ worker {worker_id} پس از پایان کار جاری متوقف می‌شود')
@@ -0,0 +1,131 @@
+# management/commands/ocr_benchmark.py
+# مقایسه‌ی دقت (CER) و سرعت موتورها روی یک مجموعه‌ی ثابت از تصاویر نمونه.
+# مجموعه‌ی نمونه و نتایج مقایسه‌ی easyocr (PyTorch) با easyocr_onnx (با و بدون quantize)
+# هنوز در مخزن نیست و این مقایسه هنوز اجرا نشده است؛ تا ثبت نتایج، easyocr موتور پیش‌فرض
+# می‌ماند. برای اجرا: manage.py ocr_benchmark <پوشه‌ی نمونه‌ها> --backends easyocr easyocr_onnx
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def edit_distance(a, b):
+    """فاصله‌ی ویرایشی (Levenshtein) دو رشته"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def char_error_rate(reference, hypothesis):
+    """نرخ خطای نویسه (CER) با نادیده گرفتن فاصله‌های اضافه"""
+    reference = ' '.join(reference.split())
+    hypothesis = ' '.join(hypothesis.split())
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return edit_distance(reference, hypothesis) / len(reference)
+
+
+class Command(BaseCommand):
+    help = 'Compare accuracy and throughput of OCR backends (e.g. PyTorch vs ONNX Runtime) on a fixed sample set'
+
+    def add_arguments(self, parser):
+        parser.add_argument('samples', help='Directory of sample images; <name>.txt next to an image is its ground truth')
+        parser.add_argument('--backends', nargs='+', default=['easyocr', 'easyocr_onnx'],
+                            help='Backends to compare; the first one is the reference when ground truth is missing')
+        parser.add_argument('--languages', default=None, help='Comma-separated languages (default: engine languages)')
+        parser.add_argument('--options', default=None,
+                            help='JSON per-backend options overriding settings, e.g. {"easyocr_onnx": {"quantize": true}}')
+        parser.add_argument('--repeat', type=int, default=1, help='Timed passes over the sample set')
+
+    def handle(self, *args, **options):
+        from ocr_app.ocr_backends import create_backend
+        from ocr_app.universal_ocr import safe_image_read
+
+        samples = self.load_samples(options['samples'], safe_image_read)
+        engine_options = getattr(settings, 'OCR_ENGINE_OPTIONS', {})
+        languages = (options['languages'].split(',') if options['languages']
+                     else engine_options.get('languages', ['fa', 'en']))
+        overrides = json.loads(options['options']) if options['options'] else {}
+
+        outputs = {}
+        rows = []
+        for name in options['backends']:
+            backend_options = dict(engine_options.get('backend_options', {}).get(name, {}))
+            backend_options.update(overrides.get(name, {}))
+
+            started = time.perf_counter()
+            reader = create_backend(name, languages, **backend_options)
+            load_seconds = time.perf_counter() - started
+
+            # اجرای گرم‌کننده خارج از زمان‌سنجی
+            reader.readtext(samples[0][1], detail=1)
+
+            started = time.perf_counter()
+            for _ in range(max(1, options['repeat'])):
+                texts = [self.read(reader, image) for _, image, _ in samples]
+            seconds = (time.perf_counter() - started) / max(1, options['repeat'])
+            outputs[name] = texts
+
+            rows.append({
+                'backend': name,
+                'load_seconds': load_seconds,
+                'images_per_second': len(samples) / seconds if seconds else 0.0,
+                'ms_per_image': seconds * 1000 / len(samples),
+            })
+
+        reference_name = options['backends'][0]
+        for row in rows:
+            texts = outputs[row['backend']]
+            errors = [
+                char_error_rate(truth if truth is not None else outputs[reference_name][i], texts[i])
+                for i, (_, _, truth) in enumerate(samples)
+            ]
+            row['cer'] = sum(errors) / len(errors)
+
+        has_truth = all(truth is not None for _, _, truth in samples)
+        self.stdout.write(f'📊 {len(samples)} تصویر، زبان‌ها: {"+".join(languages)}، '
+                          f'مرجع دقت: {"متن صحیح" if has_truth else reference_name}')
+        self.stdout.write(f'{"backend":<16}{"load (s)":>10}{"img/s":>10}{"ms/img":>10}{"CER":>10}')
+        for row in rows:
+            self.stdout.write(
+                f'{row["backend"]:<16}{row["load_seconds"]:>10.2f}{row["images_per_second"]:>10.2f}'
+                f'{row["ms_per_image"]:>10.0f}{row["cer"]:>10.3f}'
+            )
+
+    def load_samples(self, directory, read_image):
+        if not os.path.isdir(directory):
+            raise CommandError(f'پوشه‌ی نمونه‌ها یافت نشد: {directory}')
+
+        samples = []
+        for filename in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            image = read_image(os.path.join(directory, filename))
+            if image is None:
+                continue
+            truth_path = os.path.join(directory, stem + '.txt')
+            truth = None
+            if os.path.exists(truth_path):
+                with open(truth_path, encoding='utf-8') as f:
+                    truth = f.read()
+            samples.append((filename, image, truth))
+
+        if not samples:
+            raise CommandError('هیچ تصویر نمونه‌ای یافت نشد')
+        return samples
+
+    @staticmethod
+    def read(reader, image):
+        results = reader.readtext(image, detail=1)
+        return ' '.join(text for _, text, _ in results)
@@ -0,0 +1,36 @@
+# management/commands/ocr_service.py
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ocr_app.ocr_service import OCRService
+
+
+class Command(BaseCommand):
+    help = 'Run the resident OCR engine service on a Unix domain socket'
+
+    def add_arguments(self, parser):
+        service = getattr(settings, 'OCR_SERVICE', {})
+        parser.add_argument('--socket', default=service.get('socket'), help='Unix socket path')
+        parser.add_argument('--replicas', type=int, default=service.get('replicas', 1),
+                            help='Number of OCR engine replicas')
+
+    def handle(self, *args, **options):
+        service = OCRService(
+            options['socket'],
+            replicas=options['replicas'],
+            engine_options=getattr(settings, 'OCR_ENGINE_OPTIONS', {}),
+            log=self.stdout.write
+        )
+
+        def stop(signum, frame):
+            self.stdout.write(self.style.WARNING('⏹️ توقف سرویس OCR...'))
+            service.shutdown()
+
+        signal.signal(signal.SIGTERM, stop)
+
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            service.shutdown()
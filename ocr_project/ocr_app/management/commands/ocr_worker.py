@@ -1,9 +1,9 @@
 # ocr_app/management/commands/ocr_worker.py
 import time
 import os
+import signal
 import django
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from django.db import transaction
 
 # Setup Django
@@ -11,49 +11,112 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ocr_project.settings')
 django.setup()
 
 # Import models after Django setup
-from ocr_app.models import ScanQueue
+from ocr_app.engine import get_ocr_engine
+from ocr_app.models import DocumentPage
+from ocr_app.ocr_cache import get_ocr_cache, is_cacheable
+from ocr_app.ocr_service import ServiceUnavailable
+from ocr_app.prefork import PreforkSupervisor, fork_supported, set_torch_threads
+from ocr_app.scan_queue import (LeaseKeeper, LeaseLost, QueueWaiter, claim_next, finish, new_worker_id,
+                                queue_settings, release)
 
-try:
-    from ocr_app.universal_ocr import UniversalOCR
 
-    ocr_engine = UniversalOCR()
-    OCR_AVAILABLE = True
-    print("✅ UniversalOCR با موفقیت لود شد")
-except ImportError as e:
-    print(f"❌ خطا در لود OCR: {e}")
-    OCR_AVAILABLE = False
+class Drain(Exception):
+    """درخواست توقف worker بیکار (SIGTERM)"""
 
 
 class Command(BaseCommand):
     help = 'Process OCR queue'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-id', default=None,
+                            help='Identifier recorded on claimed items (default: host:pid:random)')
+        parser.add_argument('--lease', type=int, default=None,
+                            help='Lease length in seconds (default: OCR_QUEUE["lease_seconds"])')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Forked worker processes sharing one loaded engine (default: OCR_QUEUE["concurrency"])')
+        parser.add_argument('--threads', type=int, default=None,
+                            help='Torch threads per worker process (default: OCR_QUEUE["threads_per_worker"])')
+        parser.add_argument('--lane', choices=['small', 'normal'], default=None,
+                            help='Only take items of this size lane (e.g. a dedicated small-file worker)')
+
     def handle(self, *args, **options):
-        if not OCR_AVAILABLE:
+        # موتور OCR هنگام اجرای worker ساخته می‌شود، نه هنگام import این ماژول
+        self.ocr_engine = get_ocr_engine()
+        if self.ocr_engine is None:
             self.stdout.write(
                 self.style.ERROR('❌ موتور OCR در دسترس نیست. لطفا از صحت نصب کتابخانه‌ها اطمینان حاصل کنید.')
             )
             return
 
+        # چند worker می‌توانند همزمان اجرا شوند؛ هر آیتم به‌صورت اتمی و با اجاره برداشته می‌شود و
+        # آیتم‌های worker ازکارافتاده پس از پایان مهلت اجاره دوباره برداشته می‌شوند
+        worker_id = options['worker_id'] or new_worker_id()
+        self.lease_seconds = options['lease'] or queue_settings()['lease_seconds']
+        self.lane = {'small': 0, 'normal': 1}.get(options['lane'])
+        concurrency = options['concurrency'] or queue_settings()['concurrency']
+        threads = options['threads'] or queue_settings()['threads_per_worker']
+
+        if concurrency > 1 and not fork_supported():
+            self.stdout.write(self.style.WARNING('⚠️ fork در این سیستم‌عامل پشتیبانی نمی‌شود؛ اجرا با یک worker'))
+            concurrency = 1
+
+        if concurrency <= 1:
+            set_torch_threads(threads)
+            self.run_worker(worker_id)
+            return
+
+        # والد موتور را یک بار بارگذاری کرده و فرزندان وزن‌های مدل را copy-on-write به اشتراک می‌گذارند
+        def run_child(index):
+            if hasattr(self.ocr_engine, 'after_fork'):
+                self.ocr_engine.after_fork()
+            set_torch_threads(threads)
+            self.run_worker(f'{worker_id}-{index}')
+
         self.stdout.write(
-            self.style.SUCCESS('🚀 شروع پردازش صف OCR...')
+            self.style.SUCCESS(f'🚀 اجرای {concurrency} worker با موتور مشترک (نخ‌های torch هر worker: {threads or "پیش‌فرض"})')
         )
+        PreforkSupervisor(concurrency, run_child, log=self.stdout.write).run()
 
-        while True:
-            try:
-                # پیدا کردن آیتم‌های در انتظار
-                pending_items = ScanQueue.objects.filter(status='pending').order_by('created_at')
+    def run_worker(self, worker_id):
+        """حلقه‌ی برداشتن و پردازش آیتم‌های صف تا SIGTERM یا Ctrl+C"""
+        self.worker_id = worker_id
+        self.stopping = False
+        self.idle = False
+
+        def drain(signum, frame):
+            # کار جاری تمام می‌شود؛ worker بیکار بلافاصله متوقف می‌شود
+            self.stopping = True
+            if self.idle:
+                raise Drain()
+
+        signal.signal(signal.SIGTERM, drain)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🚀 شروع پردازش صف OCR (worker: {self.worker_id})...')
+        )
 
-                if pending_items.exists():
-                    self.stdout.write(f'📋 تعداد آیتم‌های در انتظار: {pending_items.count()}')
+        # worker بیکار با اعلان افزودن آیتم (سوکت محلی یا LISTEN/NOTIFY) بیدار می‌شود و در غیر
+        # این صورت صف را با فاصله‌ی رو به افزایش بررسی می‌کند
+        waiter = QueueWaiter(self.worker_id, log=self.stdout.write)
+        announced_idle = False
 
-                for item in pending_items:
-                    self.process_queue_item(item)
+        while not self.stopping:
+            try:
+                item = claim_next(self.worker_id, self.lease_seconds, self.lane)
 
-                if not pending_items.exists():
-                    self.stdout.write('⏳ هیچ آیتمی در صف وجود ندارد...')
+                if item is None:
+                    if not announced_idle:
+                        self.stdout.write('⏳ هیچ آیتمی در صف وجود ندارد...')
+                        announced_idle = True
+                    self.wait_idle(waiter.wait)
+                    continue
 
-                time.sleep(10)  # بررسی هر 10 ثانیه
+                announced_idle = False
+                waiter.reset()
+                self.process_queue_item(item)
 
+            except Drain:
+                break
             except KeyboardInterrupt:
                 self.stdout.write(
                     self.style.WARNING('⏹️ توقف worker توسط کاربر...')
@@ -63,56 +126,133 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.ERROR(f'❌ خطا در پردازش صف: {str(e)}')
                 )
-                time.sleep(30)  # در صورت خطا 30 ثانیه صبر کن
+                try:
+                    self.wait_idle(time.sleep, 30)  # در صورت خطا 30 ثانیه صبر کن
+                except Drain:
+                    break
+
+        if self.stopping:
+            self.stdout.write(self.style.WARNING(f'⏹️ worker {self.worker_id} متوقف شد'))
+        waiter.close()
+
+    def wait_idle(self, wait, *args):
+        """انتظار بدون کار در دست؛ SIGTERM در این فاصله worker را بلافاصله متوقف می‌کند"""
+        self.idle = True
+        try:
+            if self.stopping:
+                raise Drain()
+            wait(*args)
+        finally:
+            self.idle = False
+
+    def finish_item(self, item, status):
+        """ثبت وضعیت نهایی؛ اگر اجاره از دست رفته و آیتم به worker دیگری رسیده باشد تغییری داده نمی‌شود"""
+        if not finish(item, self.worker_id, status):
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ اجاره‌ی {item.document.file_name} از دست رفته بود؛ وضعیت ثبت نشد')
+            )
+            return False
+        return True
 
     def process_queue_item(self, item):
         """پردازش یک آیتم از صف"""
         try:
-            self.stdout.write(f'🔄 در حال پردازش: {item.document.file_name}')
+            with LeaseKeeper(item, self.worker_id, self.lease_seconds) as keeper:
+                self.run_ocr(item, keeper)
 
-            # تغییر وضعیت به در حال پردازش
-            item.status = 'processing'
-            item.save()
+        except LeaseLost:
+            # آیتم به worker دیگری رسیده یا دوباره برداشته می‌شود؛ نه صفحه‌ای ثبت می‌شود نه وضعیتی
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ اجاره‌ی {item.document.file_name} از دست رفت؛ پردازش متوقف شد')
+            )
 
-            # بررسی وجود فایل
-            if not item.document.original_file:
-                raise FileNotFoundError('فایل اصلی وجود ندارد')
+        except ServiceUnavailable as e:
+            # خطای سند نیست؛ آیتم به صف برمی‌گردد و worker پیش از برداشتن بعدی صبر می‌کند
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ سرویس OCR در دسترس نیست؛ {item.document.file_name} به صف برگشت')
+            )
+            release(item, self.worker_id)
+            raise
 
-            file_path = item.document.original_file.path
+        except FileNotFoundError as e:
+            self.stdout.write(
+                self.style.ERROR(f'❌ فایل یافت نشد: {str(e)}')
+            )
+            self.finish_item(item, 'failed')
+
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'❌ خطا در پردازش {item.document.file_name}: {str(e)}')
+            )
+            self.finish_item(item, 'failed')
 
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f'فایل در مسیر {file_path} یافت نشد')
+    def run_ocr(self, item, keeper):
+        """استخراج متن آیتم برداشته‌شده (در طول اجرا keeper اجاره‌ی آن را تمدید می‌کند)"""
+        self.stdout.write(f'🔄 در حال پردازش: {item.document.file_name}')
 
-            # پردازش OCR
-            self.stdout.write(f'🔍 استخراج متن از: {item.document.file_name}')
-            result = ocr_engine.extract_text(file_path)
+        # بررسی وجود فایل
+        if not item.document.original_file:
+            raise FileNotFoundError('فایل اصلی وجود ندارد')
 
-            # بروزرسانی سند
-            with transaction.atomic():
-                item.document.extracted_text = result['text']
-                item.document.extraction_confidence = result.get('confidence', 0)
-                item.document.ocr_processed = True
-                item.document.save()
+        file_path = item.document.original_file.path
 
-                item.status = 'completed'
-                item.processed_at = timezone.now()
-                item.save()
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f'فایل در مسیر {file_path} یافت نشد')
 
+        # صفحه‌های ثبت‌شده در اجرای قبلی دوباره پردازش نمی‌شوند
+        completed_pages = item.document.completed_pages()
+        if completed_pages:
+            self.stdout.write(f'⏩ ادامه از صفحه‌های ثبت‌شده ({len(completed_pages)} صفحه)')
+
+        def save_page(page):
+            # هر صفحه به محض آماده شدن ذخیره می‌شود و پیشرفت سند از همین جدول خوانده می‌شود؛
+            # با از دست رفتن اجاره، LeaseLost ادامه‌ی صفحه‌ها را متوقف می‌کند
+            keeper.check()
+            DocumentPage.objects.update_or_create(
+                document=item.document,
+                page_number=page['page'],
+                defaults={'text': page['text'], 'source': page['source'], 'confidence': page['confidence']}
+            )
             self.stdout.write(
-                self.style.SUCCESS(
-                    f'✅ پردازش کامل شد: {item.document.file_name} (دقت: {result.get("confidence", 0):.2f})')
+                f'📄 صفحه {page["page"]} آماده شد ({page["source"]}، دقت: {page["confidence"]:.2f})'
             )
 
-        except FileNotFoundError as e:
+        # پردازش OCR
+        self.stdout.write(f'🔍 استخراج متن از: {item.document.file_name}')
+        result = get_ocr_cache().extract_text(
+            self.ocr_engine, file_path, completed_pages=completed_pages, on_page=save_page
+        )
+        # LeaseLost در save_page ممکن است به نتیجه‌ی خطا تبدیل شده باشد (نگاه کنید به _extract_pages)
+        keeper.check()
+
+        # نتیجه‌ی خطا (مثلاً PDF خراب در میانه‌ی کار) به‌عنوان متن سند ثبت نمی‌شود؛ آیتم ناموفق
+        # علامت می‌خورد و صفحه‌های ثبت‌شده برای نمایش متن جزئی و ادامه‌ی بعدی باقی می‌مانند
+        if not is_cacheable(result):
+            raise RuntimeError(result.get('error') or result.get('text', ''))
+
+        # بروزرسانی سند؛ فقط اگر آیتم هنوز در اجاره‌ی همین worker باشد
+        with transaction.atomic():
+            if not self.finish_item(item, 'completed'):
+                return
+
+            item.document.extracted_text = result['text']
+            item.document.extraction_confidence = result.get('confidence', 0)
+            item.document.ocr_processed = True
+            item.document.save()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ پردازش کامل شد: {item.document.file_name} (دقت: {result.get("confidence", 0):.2f})')
+        )
+
+        if result.get('skipped_pages'):
             self.stdout.write(
-                self.style.ERROR(f'❌ فایل یافت نشد: {str(e)}')
+                f'⏭️ صفحه‌های سفید ردشده: {result["skipped_pages"]} '
+                f'(صرفه‌جویی تقریبی: {result.get("time_saved", 0):.1f} ثانیه)'
             )
-            item.status = 'failed'
-            item.save()
 
-        except Exception as e:
+        if result.get('cached'):
+            stats = get_ocr_cache().stats()
             self.stdout.write(
-                self.style.ERROR(f'❌ خطا در پردازش {item.document.file_name}: {str(e)}')
+                f'♻️ نتیجه از کش خوانده شد (برخورد: {stats["hits"]}، عدم برخورد: {stats["misses"]})'
             )
-            item.status = 'failed'
-            item.save()
\ No newline at end of file
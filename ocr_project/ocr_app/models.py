@@ -3,6 +3,8 @@ import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from .text_utils import join_pdf_pages
+
 
 class CustomUser(AbstractUser):
     MUST_CHANGE_PASSWORD = models.BooleanField(default=True, verbose_name="نیاز به تغییر رمز")
@@ -101,13 +103,12 @@ class Document(models.Model):
     extracted_text = models.TextField(blank=True, verbose_name="متن استخراج شده")
     extraction_confidence = models.FloatField(default=0, verbose_name="دقت استخراج")
     ocr_processed = models.BooleanField(default=False, verbose_name="پردازش شده")
-    scan_queue_position = models.IntegerField(default=0, verbose_name="موقعیت در صف")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "سند"
         verbose_name_plural = "اسناد"
-        ordering = ['scan_queue_position', 'created_at']
+        ordering = ['created_at']
 
     def __str__(self):
         return self.file_name
@@ -126,8 +127,54 @@ class Document(models.Model):
             return self.original_file.url
         return ''
 
+    def completed_pages(self):
+        """صفحه‌های ثبت‌شده به شکل {شماره صفحه: نتیجه‌ی صفحه} (قالب UniversalOCR.iter_pages)"""
+        return {page.page_number: page.as_result() for page in self.pages.all()}
+
+    def partial_text(self):
+        """متن صفحه‌های آماده‌شده‌ی سندی که هنوز در حال پردازش است"""
+        return join_pdf_pages(self.completed_pages())
+
+
+class DocumentPage(models.Model):
+    """نتیجه‌ی هر صفحه که در حین پردازش ذخیره می‌شود تا کار نیمه‌تمام از دست نرود"""
+    SOURCE_CHOICES = [
+        ('text', 'لایه متنی'),
+        ('ocr', 'OCR'),
+    ]
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.IntegerField(verbose_name="شماره صفحه")
+    text = models.TextField(blank=True, verbose_name="متن صفحه")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='ocr', verbose_name="منبع متن")
+    confidence = models.FloatField(default=0.0, verbose_name="دقت صفحه")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "صفحه سند"
+        verbose_name_plural = "صفحه‌های سند"
+        unique_together = ['document', 'page_number']
+        ordering = ['page_number']
+
+    def __str__(self):
+        return f"{self.document.file_name} - صفحه {self.page_number}"
+
+    def as_result(self):
+        """نتیجه‌ی صفحه در قالب UniversalOCR.iter_pages"""
+        return {'page': self.page_number, 'text': self.text, 'confidence': self.confidence, 'source': self.source}
+
 
 class ScanQueue(models.Model):
+    PRIORITY_CHOICES = [
+        (0, 'عادی'),
+        (5, 'بالا'),
+        (10, 'فوری'),
+    ]
+    LANE_CHOICES = [
+        (0, 'فایل کوچک'),
+        (1, 'عادی'),
+    ]
+
     document = models.ForeignKey(Document, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=[
         ('pending', 'در انتظار'),
@@ -137,7 +184,55 @@ class ScanQueue(models.Model):
     ], default='pending', verbose_name="وضعیت")
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
+    # workerی که آیتم را برداشته و مهلت اجاره‌ی آن؛ آیتمِ در حال پردازشی که مهلتش گذشته
+    # (مثلاً worker از کار افتاده) دوباره قابل برداشتن است (نگاه کنید به scan_queue.claim_next)
+    worker_id = models.CharField(max_length=100, blank=True, default='', verbose_name="شناسه worker")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="پایان مهلت اجاره")
+    # تعداد دفعات برداشتن؛ آیتمی که پس از max_attempts برداشتن هنوز اجاره‌اش منقضی می‌شود
+    # (مثلاً سندی که هر بار worker را از کار می‌اندازد) ناموفق ثبت می‌شود
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="تعداد تلاش")
+    # ترتیب برداشتن (scan_queue.CLAIM_ORDER): اولویت، نوبت چرخشی هر شخص تا آپلود انبوه یک شخص
+    # سندهای دیگران را پشت سر خود نگه ندارد، و فایل‌های کوچک پیش از بزرگ در هر نوبت
+    priority = models.SmallIntegerField(choices=PRIORITY_CHOICES, default=0, verbose_name="اولویت")
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, null=True, blank=True, verbose_name="شخص")
+    fair_seq = models.BigIntegerField(default=0, verbose_name="نوبت")
+    size_lane = models.SmallIntegerField(choices=LANE_CHOICES, default=1, verbose_name="مسیر")
 
     class Meta:
         verbose_name = "صف اسکن"
         verbose_name_plural = "صف اسکن"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', '-priority', 'fair_seq', 'size_lane', 'created_at'],
+                         name='scanqueue_claim_order'),
+            models.Index(fields=['person', 'status', 'fair_seq']),
+        ]
+
+
+class OCRResultCache(models.Model):
+    file_hash = models.CharField(max_length=64, verbose_name="هش محتوای فایل")
+    config_hash = models.CharField(max_length=64, verbose_name="هش تنظیمات موتور")
+    text = models.TextField(blank=True, verbose_name="متن استخراج شده")
+    text_type = models.CharField(max_length=20, verbose_name="نوع متن")
+    confidence = models.FloatField(default=0, verbose_name="دقت استخراج")
+    file_type = models.CharField(max_length=20, verbose_name="نوع فایل")
+    size = models.IntegerField(default=0, verbose_name="حجم (بایت)")
+    hit_count = models.IntegerField(default=0, verbose_name="تعداد استفاده")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True, verbose_name="آخرین استفاده")
+
+    class Meta:
+        verbose_name = "کش نتیجه OCR"
+        verbose_name_plural = "کش نتایج OCR"
+        unique_together = ['file_hash', 'config_hash']
+
+    def __str__(self):
+        return f"{self.file_hash[:12]} - {self.file_type}"
+
+    def as_result(self):
+        return {
+            'text': self.text,
+            'type': self.text_type,
+            'confidence': self.confidence,
+            'file_type': self.file_type,
+        }
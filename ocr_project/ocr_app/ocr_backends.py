@@ -0,0 +1,214 @@
+# ocr_app/ocr_backends.py
+# موتورهای قابل انتخاب OCR. همه‌ی موتورها خروجی را در قالب EasyOCR برمی‌گردانند:
+# لیستی از (bbox، متن، اطمینان) که bbox چهار نقطه‌ی [x, y] است.
+# کتابخانه‌ی هر موتور فقط هنگام ساخت همان موتور بارگذاری می‌شود.
+import os
+
+# زبان‌های پیش‌فرض
+DEFAULT_LANGUAGES = ['fa', 'en']
+
+# مسیر مدل‌های آفلاین EasyOCR
+EASYOCR_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'easyocr_models')
+
+BACKENDS = {}
+
+
+def register_backend(cls):
+    """ثبت کلاس موتور با نام آن"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def create_backend(name, languages=None, **options):
+    """ساخت موتور ثبت‌شده با نام name"""
+    if name not in BACKENDS:
+        raise ValueError(f"موتور OCR ناشناخته: {name}")
+    return BACKENDS[name](languages or DEFAULT_LANGUAGES, **options)
+
+
+def _to_bgr(image):
+    """تبدیل مسیر یا آرایه‌ی خاکستری به آرایه‌ی BGR"""
+    import cv2
+    import numpy as np
+
+    if not isinstance(image, np.ndarray):
+        from .universal_ocr import safe_image_read
+        return safe_image_read(image)
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def join_results(results):
+    """(متن، میانگین اطمینان) از خروجی readtext یک ناحیه"""
+    results = [(text, confidence) for _, text, confidence in results if text.strip()]
+    if not results:
+        return '', 0.0
+    return ' '.join(text for text, _ in results), sum(confidence for _, confidence in results) / len(results)
+
+
+class OCRBackend:
+    """رابط مشترک موتورها"""
+
+    name = None
+
+    def __init__(self, languages, **options):
+        self.languages = list(languages)
+        self.options = options
+
+    def readtext(self, image, detail=1, text_threshold=0.7, low_text=0.4, **kwargs):
+        raise NotImplementedError
+
+    def readtext_batched(self, images, detail=1, batch_size=1, **kwargs):
+        """پیش‌فرض: پردازش تک‌تک تصاویر"""
+        return [self.readtext(image, detail=detail, **kwargs) for image in images]
+
+    def has_text(self, image, canvas_size=1280):
+        """فقط تشخیص ناحیه‌ی متن (بدون بازشناسی)؛ None یعنی این موتور چنین مرحله‌ای ندارد"""
+        return None
+
+    def recognize(self, image, box):
+        """بازشناسی ناحیه‌ی box=(x_min, x_max, y_min, y_max) از تصویر؛ (متن، اطمینان)"""
+        x_min, x_max, y_min, y_max = box
+        return join_results(self.readtext(image[y_min:y_max, x_min:x_max], detail=1))
+
+
+@register_backend
+class EasyOCRBackend(OCRBackend):
+    name = 'easyocr'
+
+    def __init__(self, languages, **options):
+        super().__init__(languages, **options)
+        import easyocr
+
+        self.reader = easyocr.Reader(
+            self.languages,
+            gpu=options.get('gpu', False),
+            download_enabled=False,
+            model_storage_directory=options.get('model_path', EASYOCR_MODEL_PATH)
+        )
+
+    def readtext(self, image, detail=1, text_threshold=0.7, low_text=0.4, **kwargs):
+        return self.reader.readtext(image, detail=detail, text_threshold=text_threshold,
+                                    low_text=low_text, **kwargs)
+
+    def readtext_batched(self, images, detail=1, batch_size=1, **kwargs):
+        # تشخیص متن تصاویر هم‌اندازه در یک اجرای مدل انجام می‌شود
+        return self.reader.readtext_batched(images, detail=detail, batch_size=batch_size, **kwargs)
+
+    def has_text(self, image, canvas_size=1280):
+        # فقط مدل تشخیص CRAFT روی تصویر کوچک‌شده اجرا می‌شود
+        horizontal_list, free_list = self.reader.detect(image, canvas_size=canvas_size)
+        return bool(horizontal_list[0] or free_list[0])
+
+    def recognize(self, image, box):
+        # فقط مدل بازشناسی روی ناحیه‌ی داده‌شده اجرا می‌شود (بدون تشخیص دوباره)
+        return join_results(self.reader.recognize(image, horizontal_list=[list(box)], free_list=[], detail=1))
+
+
+@register_backend
+class EasyOCROnnxBackend(EasyOCRBackend):
+    """EasyOCR با اجرای مدل‌ها در ONNX Runtime (نگاه کنید به onnx_models)
+
+    در اولین اجرا مدل‌ها از easyocr_models به ONNX تبدیل می‌شوند. تنظیمات: quantize (نسخه‌ی
+    int8)، intra_op_threads (نخ‌های ONNX Runtime) و onnx_dir (محل فایل‌های ONNX).
+    """
+    name = 'easyocr_onnx'
+
+    def __init__(self, languages, **options):
+        OCRBackend.__init__(self, languages, **options)
+        import easyocr
+
+        from .onnx_models import (ONNX_MODEL_PATH, OnnxDetector, OnnxRecognizer, create_session,
+                                  export_onnx_models, onnx_model_paths)
+
+        # شبکه‌ها فقط برای تبدیل لازم‌اند؛ نسخه‌ی کوانتیزه‌ی PyTorch قابل تبدیل به ONNX نیست
+        self.reader = easyocr.Reader(
+            self.languages,
+            gpu=False,
+            download_enabled=False,
+            model_storage_directory=options.get('model_path', EASYOCR_MODEL_PATH),
+            quantize=False
+        )
+
+        onnx_dir = options.get('onnx_dir', ONNX_MODEL_PATH)
+        quantize = options.get('quantize', False)
+        paths = onnx_model_paths(onnx_dir, self.languages, quantize)
+        if not all(os.path.exists(path) for path in paths):
+            paths = export_onnx_models(self.reader, self.languages, onnx_dir, quantize)
+
+        threads = options.get('intra_op_threads')
+        self.reader.detector = OnnxDetector(create_session(paths[0], threads))
+        self.reader.recognizer = OnnxRecognizer(create_session(paths[1], threads))
+
+
+@register_backend
+class PaddleOCRBackend(OCRBackend):
+    name = 'paddleocr'
+
+    def __init__(self, languages, **options):
+        super().__init__(languages, **options)
+        from paddleocr import PaddleOCR
+
+        # PaddleOCR در هر نمونه فقط یک زبان دارد؛ زبان اول ملاک است
+        self.ocr = PaddleOCR(use_angle_cls=options.get('use_angle_cls', True), lang=self.languages[0])
+
+    def readtext(self, image, detail=1, text_threshold=0.0, low_text=0.4, **kwargs):
+        result = self.ocr.ocr(_to_bgr(image))
+        output = []
+        for page in result or []:
+            if not page:
+                continue
+            if hasattr(page, 'get') and 'rec_texts' in page:
+                # خروجی PaddleOCR 3
+                lines = zip(page['rec_polys'], page['rec_texts'], page['rec_scores'])
+            else:
+                # خروجی PaddleOCR 2: [bbox, (متن، اطمینان)]
+                lines = ((line[0], line[1][0], line[1][1]) for line in page if line and len(line) >= 2)
+            for bbox, text, confidence in lines:
+                output.append(([[int(x), int(y)] for x, y in bbox], text, float(confidence)))
+        return output
+
+
+@register_backend
+class TesseractBackend(OCRBackend):
+    name = 'tesseract'
+
+    # نگاشت کد زبان EasyOCR به Tesseract
+    LANGUAGE_CODES = {'fa': 'fas', 'en': 'eng', 'ar': 'ara'}
+
+    def __init__(self, languages, **options):
+        super().__init__(languages, **options)
+        import pytesseract
+
+        if options.get('tesseract_cmd'):
+            pytesseract.pytesseract.tesseract_cmd = options['tesseract_cmd']
+        self.pytesseract = pytesseract
+        self.lang = '+'.join(self.LANGUAGE_CODES.get(code, code) for code in self.languages)
+        self.config = options.get('config', '--oem 1 --psm 3')
+
+    def readtext(self, image, detail=1, text_threshold=0.0, low_text=0.4, **kwargs):
+        data = self.pytesseract.image_to_data(
+            _to_bgr(image), lang=self.lang, config=self.config,
+            output_type=self.pytesseract.Output.DICT
+        )
+
+        # کلمه‌ها در قالب خط (هم‌تراز با خروجی EasyOCR) گروه‌بندی می‌شوند
+        lines = {}
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            if confidence < 0 or not word.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(key, []).append(i)
+
+        output = []
+        for indexes in lines.values():
+            left = min(data['left'][i] for i in indexes)
+            top = min(data['top'][i] for i in indexes)
+            right = max(data['left'][i] + data['width'][i] for i in indexes)
+            bottom = max(data['top'][i] + data['height'][i] for i in indexes)
+            text = ' '.join(data['text'][i] for i in indexes)
+            confidence = sum(float(data['conf'][i]) for i in indexes) / len(indexes) / 100
+            output.append(([[left, top], [right, top], [right, bottom], [left, bottom]], text, confidence))
+        return output
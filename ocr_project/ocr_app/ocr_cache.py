@@ -0,0 +1,159 @@
+# ocr_app/ocr_cache.py
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import OCRResultCache
+
+# پیش‌فرض‌های کش نتایج OCR (قابل تغییر با OCR_CACHE در settings)
+DEFAULT_CACHE_SETTINGS = {
+    'enabled': True,
+    'max_entries': 10000,
+    'max_bytes': 200 * 1024 * 1024,
+}
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """هش SHA-256 محتوای فایل (خواندن تکه‌تکه)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_sha256(config):
+    """هش پایدار تنظیمات موتور"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_cacheable(result):
+    """نتایج خطا در کش ذخیره نمی‌شوند"""
+    if not isinstance(result, dict) or result.get('type') == 'error':
+        return False
+    text = result.get('text', '')
+    return not text.startswith('خطا') and not text.startswith('❌')
+
+
+class OCRCache:
+    """کش ماندگار نتایج OCR براساس هش محتوا و تنظیمات موتور با حذف LRU"""
+
+    def __init__(self, enabled=True, max_entries=10000, max_bytes=200 * 1024 * 1024):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, file_hash, config_hash):
+        entry = OCRResultCache.objects.filter(file_hash=file_hash, config_hash=config_hash).first()
+        if entry is None:
+            self._count(False)
+            return None
+
+        OCRResultCache.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_used_at=timezone.now()
+        )
+        self._count(True)
+        return entry.as_result()
+
+    def put(self, file_hash, config_hash, result):
+        text = result.get('text', '')
+        try:
+            OCRResultCache.objects.update_or_create(
+                file_hash=file_hash,
+                config_hash=config_hash,
+                defaults={
+                    'text': text,
+                    'text_type': result.get('type', 'unknown'),
+                    'confidence': result.get('confidence', 0),
+                    'file_type': result.get('file_type', 'unknown'),
+                    'size': len(text.encode('utf-8')),
+                    'last_used_at': timezone.now(),
+                }
+            )
+        except IntegrityError:
+            # پردازه‌ی دیگری همزمان همین نتیجه را ذخیره کرده است
+            return
+        self.evict()
+
+    def evict(self):
+        """حذف کم‌استفاده‌ترین ورودی‌ها تا رسیدن به سقف تعداد و حجم"""
+        entries = OCRResultCache.objects.order_by('last_used_at')
+
+        excess = entries.count() - self.max_entries
+        if excess > 0:
+            stale_ids = list(entries.values_list('pk', flat=True)[:excess])
+            OCRResultCache.objects.filter(pk__in=stale_ids).delete()
+
+        total = OCRResultCache.objects.aggregate(total=Sum('size'))['total'] or 0
+        if total <= self.max_bytes:
+            return
+
+        stale_ids = []
+        for pk, size in entries.values_list('pk', 'size').iterator():
+            if total <= self.max_bytes:
+                break
+            stale_ids.append(pk)
+            total -= size
+        OCRResultCache.objects.filter(pk__in=stale_ids).delete()
+
+    def extract_text(self, engine, file_path, text_type="auto", **options):
+        """نتیجه از کش، یا اجرای OCR و ذخیره‌ی نتیجه (options به engine.extract_text می‌رسد)"""
+        if not self.enabled:
+            return engine.extract_text(file_path, text_type, **options)
+
+        file_hash = file_sha256(file_path)
+        config_hash = config_sha256(engine.config_signature(
+            text_type, options.get('backend'), options.get('languages'), options.get('reader_options')
+        ))
+
+        cached = self.get(file_hash, config_hash)
+        if cached is not None:
+            cached['cached'] = True
+            return cached
+
+        result = engine.extract_text(file_path, text_type, **options)
+        if is_cacheable(result):
+            self.put(file_hash, config_hash, result)
+        return result
+
+    def stats(self):
+        """آمار کش: برخورد/عدم برخورد همین پردازه و حجم کل"""
+        aggregate = OCRResultCache.objects.aggregate(total=Sum('size'), hits=Sum('hit_count'))
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': OCRResultCache.objects.count(),
+            'size_bytes': aggregate['total'] or 0,
+            'total_hits': aggregate['hits'] or 0,
+        }
+
+
+_ocr_cache = None
+
+
+def get_ocr_cache():
+    """نمونه‌ی مشترک کش با تنظیمات settings.OCR_CACHE"""
+    global _ocr_cache
+    if _ocr_cache is None:
+        options = dict(DEFAULT_CACHE_SETTINGS)
+        options.update(getattr(settings, 'OCR_CACHE', {}))
+        _ocr_cache = OCRCache(**options)
+    return _ocr_cache
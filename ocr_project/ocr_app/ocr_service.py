@@ -0,0 +1,363 @@
+# ocr_app/ocr_service.py
+# سرویس ماندگار OCR روی Unix domain socket: یک پردازه مدل‌ها را گرم نگه می‌دارد
+# و پردازه‌های وب و workerها فقط کلاینت سبک آن هستند.
+#
+# پروتکل: هر پیام یک JSON با پیشوند طول ۴ بایتی (big-endian) است.
+#   درخواست: {'id', 'op': 'ping' | 'config' | 'extract', 'path' یا 'data' (base64) و 'filename',
+#             'text_type', 'backend', 'languages', 'reader_options', 'completed_pages': [نتیجه‌ی صفحه...],
+#             'pages': bool}
+#   پاسخ:    {'id', 'event': 'page', 'page': نتیجه‌ی صفحه} برای هر صفحه (در صورت درخواست)
+#             و در پایان {'id', 'result': {...}} یا {'id', 'error': '...'}
+# چند درخواست روی یک اتصال می‌توانند همزمان در جریان باشند و پاسخ‌ها با id مشخص می‌شوند.
+import base64
+import itertools
+import json
+import os
+import queue
+import socket
+import struct
+import tempfile
+import threading
+
+_HEADER = struct.Struct('>I')
+
+
+def send_message(sock, message):
+    """ارسال یک پیام JSON با پیشوند طول"""
+    payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """دریافت یک پیام JSON؛ در صورت بسته شدن اتصال None"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exact(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload.decode('utf-8'))
+
+
+class ServiceUnavailable(ConnectionError):
+    """سرویس در دسترس نیست یا اتصال در میانه‌ی درخواست قطع شد؛ درخواست را می‌توان تکرار کرد"""
+
+
+def error_result(message):
+    """نتیجه‌ی خطا با همان قالب UniversalOCR.extract_text"""
+    return {
+        'text': f"❌ خطا: {message}",
+        'type': 'error',
+        'confidence': 0.0,
+        'file_type': 'error'
+    }
+
+
+class _Connection:
+    """اتصال یک کلاینت؛ ارسال پاسخ‌ها از چند نخ با قفل انجام می‌شود"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, message):
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                send_message(self.sock, message)
+            except OSError:
+                self.closed = True
+
+
+class OCRService:
+    """سرویس OCR با replicas نسخه از موتور که درخواست‌ها را از یک صف مشترک برمی‌دارند"""
+
+    def __init__(self, socket_path, replicas=1, engine_options=None, log=print):
+        self.socket_path = socket_path
+        self.replicas = max(1, int(replicas))
+        self.engine_options = engine_options or {}
+        self.log = log
+        self._jobs = queue.Queue()
+        self._server = None
+        self._stopping = False
+        self.engines = []
+
+    def serve_forever(self):
+        from .universal_ocr import UniversalOCR
+
+        for index in range(self.replicas):
+            engine = UniversalOCR(**self.engine_options)
+            self.engines.append(engine)
+            threading.Thread(target=self._replica_loop, args=(engine,), daemon=True,
+                             name=f'ocr-replica-{index}').start()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        self._server.listen(64)
+        self.log(f"🚀 سرویس OCR روی {self.socket_path} با {self.replicas} نسخه از موتور آماده است")
+
+        while not self._stopping:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._connection_loop, args=(_Connection(conn),), daemon=True).start()
+
+    def shutdown(self):
+        self._stopping = True
+        for _ in self.engines:
+            self._jobs.put((None, None))
+        if self._server is not None:
+            self._server.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        for engine in self.engines:
+            engine.close()
+
+    def _connection_loop(self, conn):
+        try:
+            while True:
+                request = recv_message(conn.sock)
+                if request is None:
+                    break
+
+                op = request.get('op', 'extract')
+                if op == 'ping':
+                    conn.send({'id': request.get('id'), 'result': 'pong'})
+                elif op == 'config':
+                    signature = self.engines[0].config_signature(request.get('text_type', 'auto'),
+                                                                 request.get('backend'), request.get('languages'),
+                                                                 request.get('reader_options'))
+                    conn.send({'id': request.get('id'), 'result': signature})
+                else:
+                    # پردازش در نخ‌های موتور؛ خواندن درخواست‌های بعدی همین اتصال ادامه می‌یابد
+                    self._jobs.put((conn, request))
+        except (OSError, ValueError) as e:
+            self.log(f"⚠️ خطا در اتصال کلاینت: {e}")
+        finally:
+            conn.closed = True
+            conn.sock.close()
+
+    def _replica_loop(self, engine):
+        while True:
+            conn, request = self._jobs.get()
+            if conn is None:
+                break
+            if not conn.closed:
+                self._handle_extract(engine, conn, request)
+
+    def _handle_extract(self, engine, conn, request):
+        request_id = request.get('id')
+        temp_path = None
+        try:
+            path = request.get('path')
+            if request.get('data') is not None:
+                suffix = os.path.splitext(request.get('filename') or '')[1]
+                with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                    f.write(base64.b64decode(request['data']))
+                    temp_path = f.name
+                path = temp_path
+
+            on_page = None
+            if request.get('pages'):
+                def on_page(page):
+                    conn.send({'id': request_id, 'event': 'page', 'page': page})
+
+            completed_pages = {page['page']: page for page in request.get('completed_pages') or []}
+            result = engine.extract_text(path, request.get('text_type', 'auto'),
+                                         completed_pages=completed_pages, on_page=on_page,
+                                         backend=request.get('backend'), languages=request.get('languages'),
+                                         reader_options=request.get('reader_options'))
+            conn.send({'id': request_id, 'result': result})
+        except Exception as e:
+            conn.send({'id': request_id, 'error': str(e)})
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class OCRServiceClient:
+    """کلاینت سبک سرویس OCR با همان رابط UniversalOCR (هر نخ اتصال خودش را دارد)"""
+
+    ocr_available = True
+
+    def __init__(self, socket_path, timeout=600):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._signatures = {}
+
+    def _socket(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                # مثلاً سرویس در حال راه‌اندازی دوباره است (سوکت وجود ندارد یا اتصال رد می‌شود)
+                sock.close()
+                raise ServiceUnavailable(f'اتصال به سرویس OCR در {self.socket_path} ممکن نشد: {e}') from e
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def after_fork(self):
+        """اتصال‌های والد در پردازه‌ی فرزند fork استفاده نمی‌شوند"""
+        self._local = threading.local()
+
+    def _exchange(self, requests, on_page=None):
+        """ارسال پشت‌سرهم درخواست‌ها و جمع‌آوری پاسخ نهایی هر کدام"""
+        try:
+            sock = self._socket()
+            for request in requests:
+                request['id'] = next(self._ids)
+                send_message(sock, request)
+
+            responses = {}
+            while len(responses) < len(requests):
+                message = recv_message(sock)
+                if message is None:
+                    raise ServiceUnavailable('اتصال به سرویس OCR قطع شد')
+                if message.get('event') == 'page':
+                    if on_page is not None:
+                        on_page(message['page'])
+                    continue
+                responses[message['id']] = message
+        except ServiceUnavailable:
+            self._reset()
+            raise
+        except OSError as e:
+            self._reset()
+            raise ServiceUnavailable(f'ارتباط با سرویس OCR قطع شد: {e}') from e
+        except Exception:
+            # پاسخ‌های ناقص روی این اتصال باقی نمانند
+            self._reset()
+            raise
+
+        return [responses[request['id']] for request in requests]
+
+    def ping(self):
+        try:
+            return self._exchange([{'op': 'ping'}])[0].get('result') == 'pong'
+        except (OSError, ValueError):
+            return False
+
+    def config_signature(self, text_type="auto", backend=None, languages=None, reader_options=None):
+        key = (text_type, backend, tuple(languages or ()), json.dumps(reader_options or {}, sort_keys=True))
+        if key not in self._signatures:
+            response = self._exchange([{'op': 'config', 'text_type': text_type, 'backend': backend,
+                                        'languages': languages, 'reader_options': reader_options}])[0]
+            self._signatures[key] = response['result']
+        return self._signatures[key]
+
+    @staticmethod
+    def _as_result(response):
+        if 'error' in response:
+            return error_result(response['error'])
+        return response['result']
+
+    @staticmethod
+    def _extract_request(file_path, text_type, completed_pages=None, on_page=None, backend=None,
+                         languages=None, reader_options=None):
+        return {
+            'op': 'extract',
+            'path': os.path.abspath(file_path),
+            'text_type': text_type,
+            'backend': backend,
+            'languages': languages,
+            'reader_options': reader_options,
+            'completed_pages': list((completed_pages or {}).values()),
+            'pages': on_page is not None,
+        }
+
+    def extract_text(self, file_path, text_type="auto", completed_pages=None, on_page=None, backend=None,
+                     languages=None, reader_options=None):
+        request = self._extract_request(file_path, text_type, completed_pages, on_page, backend,
+                                        languages, reader_options)
+        return self._as_result(self._exchange([request], on_page)[0])
+
+    def iter_pages(self, file_path, text_type="auto", completed_pages=None, backend=None, languages=None,
+                   reader_options=None):
+        """صفحه‌ها به محض رسیدن از سرویس (هم‌رابط UniversalOCR.iter_pages)"""
+        request = self._extract_request(file_path, text_type, completed_pages, True, backend,
+                                        languages, reader_options)
+        finished = False
+        streamed = False
+        try:
+            sock = self._socket()
+            request['id'] = next(self._ids)
+            send_message(sock, request)
+            while True:
+                message = recv_message(sock)
+                if message is None:
+                    raise ServiceUnavailable('اتصال به سرویس OCR قطع شد')
+                if message.get('event') == 'page':
+                    streamed = True
+                    yield message['page']
+                    continue
+                finished = True
+                if 'error' in message:
+                    raise RuntimeError(message['error'])
+                result = message['result']
+                # سرویس فقط صفحه‌های PDF و تصویر چندصفحه‌ای را جداگانه می‌فرستد (نتیجه‌ی آن‌ها 'pages'
+                # دارد)؛ تصویر تک‌صفحه‌ای، Word و متن مانند UniversalOCR.iter_pages یک صفحه با کل نتیجه‌اند
+                if not streamed and 'pages' not in result:
+                    source = 'ocr' if result.get('file_type') == 'image' else 'text'
+                    yield {'page': 1, 'text': result['text'], 'confidence': result.get('confidence', 0.0),
+                           'source': source}
+                return
+        finally:
+            # اگر مصرف‌کننده زودتر رها کند، پاسخ‌های باقی‌مانده روی این اتصال نمی‌مانند
+            if not finished:
+                self._reset()
+
+    def extract_bytes(self, data, filename='', text_type="auto", backend=None, languages=None, reader_options=None):
+        """ارسال محتوای فایل به‌جای مسیر (وقتی سرویس به فایل‌سیستم کلاینت دسترسی ندارد)"""
+        request = {
+            'op': 'extract',
+            'data': base64.b64encode(data).decode('ascii'),
+            'filename': filename,
+            'text_type': text_type,
+            'backend': backend,
+            'languages': languages,
+            'reader_options': reader_options,
+        }
+        return self._as_result(self._exchange([request])[0])
+
+    def extract_many(self, file_paths, text_type="auto", backend=None, languages=None, reader_options=None):
+        """ارسال همزمان چند فایل روی یک اتصال؛ نتایج به ترتیب ورودی"""
+        requests = [
+            self._extract_request(path, text_type, backend=backend, languages=languages,
+                                  reader_options=reader_options)
+            for path in file_paths
+        ]
+        return [self._as_result(response) for response in self._exchange(requests)]
+
+    def extract_text_simple(self, file_path):
+        return self.extract_text(file_path)['text']
+
+    def close(self):
+        self._reset()
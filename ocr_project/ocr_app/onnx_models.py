@@ -0,0 +1,140 @@
+# ocr_app/onnx_models.py
+# اجرای مدل‌های EasyOCR (تشخیص CRAFT و بازشناسی) با ONNX Runtime روی CPU.
+# مدل‌های easyocr_models یک بار به ONNX تبدیل می‌شوند (و در صورت درخواست با
+# کوانتیزه‌سازی پویای int8 کوچک می‌شوند) و سپس به‌جای شبکه‌های PyTorch داخل
+# easyocr.Reader قرار می‌گیرند؛ بقیه‌ی مراحل EasyOCR (پیش‌پردازش، ساخت کادرها،
+# رمزگشایی CTC) بدون تغییر می‌ماند و خروجی همان قالب readtext است.
+import os
+
+from .ocr_backends import EASYOCR_MODEL_PATH
+
+# مسیر پیش‌فرض فایل‌های ONNX
+ONNX_MODEL_PATH = os.path.join(EASYOCR_MODEL_PATH, 'onnx')
+
+ONNX_OPSET = 13
+
+
+def onnx_model_paths(onnx_dir, languages, quantize=False):
+    """مسیر فایل‌های ONNX تشخیص و بازشناسی (بازشناسی به مجموعه‌ی زبان‌ها وابسته است)"""
+    suffix = '.int8.onnx' if quantize else '.onnx'
+    return (
+        os.path.join(onnx_dir, 'craft_detector' + suffix),
+        os.path.join(onnx_dir, 'recognizer_' + '-'.join(languages) + suffix),
+    )
+
+
+def _export_detector(detector, path):
+    import torch
+
+    dummy = torch.randn(1, 3, 640, 640)
+    torch.onnx.export(
+        detector, dummy, path,
+        input_names=['image'], output_names=['score', 'feature'],
+        dynamic_axes={
+            'image': {0: 'batch', 2: 'height', 3: 'width'},
+            'score': {0: 'batch', 1: 'score_height', 2: 'score_width'},
+            'feature': {0: 'batch', 2: 'feature_height', 3: 'feature_width'},
+        },
+        opset_version=ONNX_OPSET,
+    )
+
+
+def _export_recognizer(recognizer, path, image_height):
+    import torch
+
+    class _Recognizer(torch.nn.Module):
+        # ورودی text در forward مدل‌های EasyOCR استفاده نمی‌شود
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, image):
+            return self.model(image, None)
+
+    dummy = torch.randn(1, 1, image_height, 256)
+    torch.onnx.export(
+        _Recognizer(recognizer), dummy, path,
+        input_names=['image'], output_names=['preds'],
+        dynamic_axes={'image': {0: 'batch', 3: 'width'}, 'preds': {0: 'batch', 1: 'steps'}},
+        opset_version=ONNX_OPSET,
+    )
+
+
+def export_onnx_models(reader, languages, onnx_dir=ONNX_MODEL_PATH, quantize=False, force=False, log=print):
+    """تبدیل شبکه‌های easyocr.Reader (ساخته‌شده با quantize=False) به ONNX
+
+    فایل‌های موجود دوباره ساخته نمی‌شوند مگر با force. با quantize نسخه‌ی int8 با
+    کوانتیزه‌سازی پویای ONNX Runtime هم ساخته می‌شود. مسیر فایل‌های نهایی را برمی‌گرداند.
+    """
+    os.makedirs(onnx_dir, exist_ok=True)
+    detector_path, recognizer_path = onnx_model_paths(onnx_dir, languages)
+
+    reader.detector.eval()
+    reader.recognizer.eval()
+    if force or not os.path.exists(detector_path):
+        log(f"تبدیل مدل تشخیص CRAFT به ONNX: {detector_path}")
+        _export_detector(reader.detector, detector_path)
+    if force or not os.path.exists(recognizer_path):
+        log(f"تبدیل مدل بازشناسی ({'+'.join(languages)}) به ONNX: {recognizer_path}")
+        _export_recognizer(reader.recognizer, recognizer_path, getattr(reader, 'imgH', 64))
+
+    if not quantize:
+        return detector_path, recognizer_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_paths = onnx_model_paths(onnx_dir, languages, quantize=True)
+    for source, target in zip((detector_path, recognizer_path), quantized_paths):
+        if force or not os.path.exists(target):
+            log(f"کوانتیزه‌سازی int8: {target}")
+            quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    return quantized_paths
+
+
+def create_session(path, intra_op_threads=None):
+    """جلسه‌ی ONNX Runtime روی CPU با تعداد نخ‌های داخلی مشخص"""
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if intra_op_threads:
+        options.intra_op_num_threads = int(intra_op_threads)
+    options.inter_op_num_threads = 1
+    return onnxruntime.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+class OnnxDetector:
+    """جایگزین شبکه‌ی CRAFT داخل easyocr.Reader؛ خروجی مانند مدل PyTorch تنسور torch است"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+    def __call__(self, image):
+        import torch
+
+        score, feature = self.session.run(None, {'image': image.cpu().numpy()})
+        return torch.from_numpy(score), torch.from_numpy(feature)
+
+
+class OnnxRecognizer:
+    """جایگزین شبکه‌ی بازشناسی داخل easyocr.Reader"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+    def __call__(self, image, text=None):
+        import torch
+
+        return torch.from_numpy(self.session.run(None, {'image': image.cpu().numpy()})[0])
@@ -1,26 +1,20 @@
-from paddleocr import PaddleOCR
-import cv2
-import numpy as np
-from PIL import Image
+from .ocr_backends import create_backend
 
-# راه‌اندازی با مدل فارسی
-ocr = PaddleOCR(
-    use_angle_cls=True,
-    lang='fa'
-)
+# موتور PaddleOCR با مدل فارسی در اولین استفاده ساخته می‌شود
+# (برای استفاده در UniversalOCR، backend='paddleocr' را در OCR_ENGINE_OPTIONS تنظیم کنید)
+_paddle_backend = None
 
 
 def paddle_ocr_offline(image_path):
+    global _paddle_backend
     try:
-        result = ocr.ocr(image_path)
-        text = ''
+        if _paddle_backend is None:
+            _paddle_backend = create_backend('paddleocr', ['fa'])
 
-        if result and result[0]:
-            for line in result[0]:
-                if line and len(line) >= 2:
-                    text += line[1][0] + '\n'
+        results = _paddle_backend.readtext(image_path)
+        text = '\n'.join(line_text for _, line_text, _ in results)
 
         return text.strip() if text.strip() else "متنی یافت نشد"
 
     except Exception as e:
-        return f"خطا: {str(e)}"
\ No newline at end of file
+        return f"خطا: {str(e)}"
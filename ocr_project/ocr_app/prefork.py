@@ -0,0 +1,105 @@
+# ocr_app/prefork.py
+# اجرای چند worker با fork از یک پردازه‌ی والد که موتور OCR را یک بار بارگذاری کرده است.
+# صفحه‌های حافظه‌ی وزن‌های مدل بین فرزندان به‌صورت copy-on-write مشترک می‌مانند، پس حافظه
+# با تعداد workerها خطی زیاد نمی‌شود. والد فرزندان ازکارافتاده را دوباره راه می‌اندازد و با
+# SIGTERM/SIGINT به همه‌ی فرزندان SIGTERM می‌فرستد و تا پایان کار جاری آن‌ها صبر می‌کند.
+import gc
+import os
+import signal
+import sys
+import time
+
+from django.db import connections
+
+# فاصله‌ی حداقل بین دو راه‌اندازی دوباره‌ی یک فرزند (ثانیه) تا خطای تکراری حلقه‌ی fork نسازد
+RESTART_DELAY = 5
+
+
+def fork_supported():
+    return hasattr(os, 'fork')
+
+
+def set_torch_threads(threads):
+    """تعداد نخ‌های محاسباتی torch در این پردازه (اگر torch بارگذاری شده باشد)"""
+    if not threads:
+        return
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(int(threads))
+
+
+class PreforkSupervisor:
+    """ساخت و نظارت بر concurrency فرزند؛ run_child(index) در هر فرزند اجرا می‌شود"""
+
+    def __init__(self, concurrency, run_child, log=print):
+        self.concurrency = concurrency
+        self.run_child = run_child
+        self.log = log
+        self.children = {}  # {pid: شماره‌ی فرزند}
+        self.started_at = {}  # {شماره‌ی فرزند: زمان آخرین راه‌اندازی}
+        self.stopping = False
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                self.run_child(index)
+            except BaseException as e:
+                self.log(f"❌ worker {index} با خطا متوقف شد: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+
+        self.children[pid] = index
+        self.started_at[index] = time.monotonic()
+        self.log(f"👷 worker {index} راه‌اندازی شد (pid {pid})")
+
+    def _stop(self, signum, frame):
+        if not self.stopping:
+            self.log("⏹️ توقف workerها پس از پایان کار جاری...")
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        # اتصال‌های پایگاه داده نباید بین پردازه‌ها مشترک شوند؛ هر فرزند اتصال خودش را می‌سازد
+        connections.close_all()
+        # اشیای موجود (از جمله مدل‌ها) از جمع‌آوری زباله کنار گذاشته می‌شوند تا gc فرزندان
+        # با نوشتن روی سرآیند آن‌ها صفحه‌های مشترک را کپی نکند
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for index in range(self.concurrency):
+            self._spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                self.log(f"✅ worker {index} متوقف شد")
+                continue
+
+            self.log(f"⚠️ worker {index} (pid {pid}) با کد {code} پایان یافت؛ راه‌اندازی دوباره")
+            wait = RESTART_DELAY - (time.monotonic() - self.started_at[index])
+            if wait > 0:
+                time.sleep(wait)
+            if not self.stopping:
+                self._spawn(index)
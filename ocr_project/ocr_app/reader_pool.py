@@ -0,0 +1,123 @@
+# ocr_app/reader_pool.py
+# استخر موتورهای گرم OCR براساس (موتور، زبان‌ها، تنظیمات): مثلاً سند فقط انگلیسی
+# با مدل کوچک‌تر لاتین خوانده می‌شود و سند فارسی با مدل عربی/فارسی. با عبور از سقف
+# حافظه یا تعداد، کم‌استفاده‌ترین موتور (LRU) کنار گذاشته می‌شود.
+import gc
+import json
+import threading
+from collections import OrderedDict
+
+from .ocr_backends import create_backend
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# تخمین حافظه‌ی هر موتور (مگابایت) وقتی اندازه‌گیری با psutil ممکن نیست
+ESTIMATED_READER_MEMORY_MB = {
+    'easyocr': 400,
+    'paddleocr': 300,
+    'tesseract': 50,
+}
+DEFAULT_READER_MEMORY_MB = 300
+
+
+def reader_key(backend, languages, options=None):
+    """کلید یکتای پیکربندی موتور"""
+    return backend, tuple(languages), json.dumps(options or {}, sort_keys=True)
+
+
+def _rss_mb():
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class ReaderPool:
+    """موتورهای ساخته‌شده با حذف LRU در صورت عبور از max_memory_mb یا max_readers"""
+
+    def __init__(self, max_memory_mb=None, max_readers=None, log=print):
+        self.max_memory_mb = max_memory_mb
+        self.max_readers = max_readers
+        self.log = log
+        # {کلید: (موتور، حافظه‌ی تخمینی)} به ترتیب آخرین استفاده
+        self._readers = OrderedDict()
+        self._lock = threading.Lock()
+        # {کلید: Event} موتورهای در حال ساخت؛ ساخت بیرون از قفل انجام می‌شود
+        self._loading = {}
+
+    def get(self, backend, languages, options=None):
+        """موتور گرم همین پیکربندی، یا ساخت آن (و حذف کم‌استفاده‌ترین‌ها در صورت نیاز)
+
+        ساخت موتور (بارگذاری مدل، چند ثانیه) بیرون از قفل انجام می‌شود تا درخواست‌های موتورهای
+        گرم دیگر منتظر نمانند؛ درخواست دوم همان کلید تا پایان ساخت اول صبر می‌کند.
+        """
+        key = reader_key(backend, languages, options)
+        while True:
+            with self._lock:
+                if key in self._readers:
+                    self._readers.move_to_end(key)
+                    return self._readers[key][0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # اگر ساخت ناموفق باشد این درخواست خودش دوباره تلاش می‌کند
+            loading.wait()
+
+        try:
+            before = _rss_mb()
+            reader = create_backend(backend, list(languages), **(options or {}))
+            after = _rss_mb()
+            memory_mb = after - before if before is not None and after > before else \
+                ESTIMATED_READER_MEMORY_MB.get(backend, DEFAULT_READER_MEMORY_MB)
+
+            with self._lock:
+                self._readers[key] = (reader, memory_mb)
+                self._evict()
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+        self.log(f"✅ موتور {backend} با زبان‌های {'+'.join(languages)} آماده شد (~{memory_mb:.0f} MB)")
+        return reader
+
+    def _evict(self):
+        evicted = False
+        # موتور تازه‌ساخته‌شده (آخر صف) هیچ‌وقت حذف نمی‌شود
+        while len(self._readers) > 1 and (
+                (self.max_readers and len(self._readers) > self.max_readers) or
+                (self.max_memory_mb and self.memory_mb() > self.max_memory_mb)):
+            (backend, languages, _), (_, memory_mb) = self._readers.popitem(last=False)
+            self.log(f"♻️ موتور {backend} ({'+'.join(languages)}) برای آزادسازی ~{memory_mb:.0f} MB کنار گذاشته شد")
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def memory_mb(self):
+        return sum(memory_mb for _, memory_mb in self._readers.values())
+
+    def preload(self, configs, default_backend, default_languages, backend_options=None):
+        """ساخت پیشاپیش موتورهای فهرست‌شده: [{'backend', 'languages', 'options'}, ...]"""
+        backend_options = backend_options or {}
+        for config in configs or []:
+            backend = config.get('backend', default_backend)
+            options = dict(backend_options.get(backend, {}))
+            options.update(config.get('options') or {})
+            try:
+                self.get(backend, config.get('languages') or default_languages, options)
+            except Exception as e:
+                self.log(f"❌ خطا در پیش‌بارگذاری موتور {backend}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'readers': [
+                    {'backend': backend, 'languages': list(languages), 'memory_mb': round(memory_mb)}
+                    for (backend, languages, _), (_, memory_mb) in self._readers.items()
+                ],
+                'memory_mb': round(self.memory_mb()),
+                'max_memory_mb': self.max_memory_mb,
+            }
@@ -0,0 +1,389 @@
+# ocr_app/scan_queue.py
+# برداشتن اتمی آیتم‌های صف اسکن تا چند worker (روی چند هسته یا چند سرور) یک سند را
+# دو بار پردازش نکنند. هر آیتم برداشته‌شده یک اجاره (worker_id و lease_expires_at) دارد
+# که worker در طول پردازش تمدید می‌کند؛ اگر worker از کار بیفتد، با پایان مهلت اجاره
+# آیتم دوباره قابل برداشتن است.
+import os
+import select
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from .models import ScanQueue
+
+# پیش‌فرض‌های صف (قابل تغییر با OCR_QUEUE در settings)
+DEFAULT_QUEUE_SETTINGS = {
+    'lease_seconds': 300,
+    'max_attempts': 3,
+    'wakeup_dir': None,
+    'poll_min_seconds': 1,
+    'poll_max_seconds': 30,
+    'concurrency': 1,
+    'threads_per_worker': None,
+    'small_file_bytes': 1024 * 1024,
+}
+
+# ترتیب برداشتن: اولویت بیشتر، سپس نوبت چرخشی اشخاص، فایل کوچک و قدیمی‌تر
+# (ایندکس scanqueue_claim_order در ScanQueue.Meta)
+CLAIM_ORDER = ('-priority', 'fair_seq', 'size_lane', 'created_at', 'pk')
+
+# تعداد تلاش برای برداشتن وقتی worker دیگری همزمان همان آیتم را برداشته است
+CLAIM_ATTEMPTS = 5
+
+
+def queue_settings():
+    options = dict(DEFAULT_QUEUE_SETTINGS)
+    options.update(getattr(settings, 'OCR_QUEUE', {}))
+    return options
+
+
+def new_worker_id():
+    """شناسه‌ی یکتای worker: نام سرور، شماره‌ی پردازه و یک پسوند تصادفی"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def claimable(now):
+    """آیتم‌های در انتظار و آیتم‌های در حال پردازشی که اجاره‌شان تمام شده است"""
+    return Q(status='pending') | Q(status='processing', lease_expires_at__lt=now) | \
+        Q(status='processing', lease_expires_at__isnull=True)
+
+
+def fail_exhausted(now, max_attempts=None):
+    """ثبت ناموفق آیتم‌های در حال پردازشی که اجاره‌شان تمام شده و max_attempts بار برداشته شده‌اند"""
+    max_attempts = max_attempts or queue_settings()['max_attempts']
+    return ScanQueue.objects.filter(
+        Q(lease_expires_at__lt=now) | Q(lease_expires_at__isnull=True),
+        status='processing', attempts__gte=max_attempts,
+    ).update(status='failed', processed_at=now, lease_expires_at=None)
+
+
+def claim_next(worker_id, lease_seconds=None, lane=None):
+    """برداشتن اتمی اولین آیتم قابل برداشتن به ترتیب CLAIM_ORDER؛ در صورت خالی بودن صف None
+
+    با lane فقط آیتم‌های همان مسیر (مثلاً 0 برای worker اختصاصی فایل‌های کوچک) برداشته می‌شوند.
+
+    روی PostgreSQL با SELECT ... FOR UPDATE SKIP LOCKED (workerها منتظر هم نمی‌مانند) و
+    روی SQLite و سایر پایگاه‌ها با UPDATE شرطی که فقط برای یکی از workerها موفق می‌شود.
+    هر برداشتن attempts را یکی زیاد می‌کند (نگاه کنید به fail_exhausted).
+    """
+    lease_seconds = lease_seconds or queue_settings()['lease_seconds']
+    now = timezone.now()
+    claim = {
+        'status': 'processing',
+        'worker_id': worker_id,
+        'lease_expires_at': now + timedelta(seconds=lease_seconds),
+        'attempts': F('attempts') + 1,
+    }
+    # آیتمی که با هر برداشتن worker را از کار می‌اندازد بی‌پایان دوباره برداشته نمی‌شود
+    fail_exhausted(now)
+
+    candidates = claimable(now)
+    if lane is not None:
+        candidates &= Q(size_lane=lane)
+
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            pk = (ScanQueue.objects.select_for_update(skip_locked=True)
+                  .filter(candidates).order_by(*CLAIM_ORDER)
+                  .values_list('pk', flat=True).first())
+            if pk is None:
+                return None
+            ScanQueue.objects.filter(pk=pk).update(**claim)
+        return ScanQueue.objects.select_related('document').get(pk=pk)
+
+    for _ in range(CLAIM_ATTEMPTS):
+        pk = ScanQueue.objects.filter(candidates).order_by(*CLAIM_ORDER).values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        # شرط claimable دوباره در همان UPDATE بررسی می‌شود؛ اگر worker دیگری زودتر برداشته باشد 0 ردیف
+        if ScanQueue.objects.filter(candidates, pk=pk).update(**claim):
+            return ScanQueue.objects.select_related('document').get(pk=pk)
+    return None
+
+
+def renew_lease(item, worker_id, lease_seconds=None):
+    """تمدید اجاره؛ اگر آیتم دیگر متعلق به این worker نباشد False"""
+    lease_seconds = lease_seconds or queue_settings()['lease_seconds']
+    return ScanQueue.objects.filter(pk=item.pk, worker_id=worker_id, status='processing').update(
+        lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds)
+    ) == 1
+
+
+def finish(item, worker_id, status):
+    """ثبت وضعیت نهایی فقط اگر آیتم هنوز در اجاره‌ی همین worker باشد"""
+    return ScanQueue.objects.filter(pk=item.pk, worker_id=worker_id, status='processing').update(
+        status=status,
+        processed_at=timezone.now(),
+        lease_expires_at=None,
+    ) == 1
+
+
+def release(item, worker_id):
+    """برگرداندن آیتم به صف بدون حساب شدن این برداشتن در attempts (مثلاً سرویس OCR در دسترس نیست)"""
+    return ScanQueue.objects.filter(pk=item.pk, worker_id=worker_id, status='processing').update(
+        status='pending',
+        worker_id='',
+        lease_expires_at=None,
+        attempts=F('attempts') - 1,
+    ) == 1
+
+
+class LeaseLost(Exception):
+    """اجاره‌ی آیتم تمدید نشد و آیتم ممکن است در دست worker دیگری باشد"""
+
+
+class LeaseKeeper:
+    """تمدید دوره‌ای اجاره در یک نخ جدا در طول پردازش یک آیتم (with LeaseKeeper(...))"""
+
+    def __init__(self, item, worker_id, lease_seconds=None):
+        self.item = item
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds or queue_settings()['lease_seconds']
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        try:
+            # تمدید در یک‌سوم مهلت تا یک تأخیر موقت باعث از دست رفتن اجاره نشود
+            while not self._stop.wait(self.lease_seconds / 3):
+                if not renew_lease(self.item, self.worker_id, self.lease_seconds):
+                    self.lost = True
+                    break
+        finally:
+            close_old_connections()
+            connection.close()
+
+    def check(self):
+        """LeaseLost اگر اجاره از دست رفته باشد؛ پیش از نوشتن هر نتیجه صدا زده می‌شود"""
+        if self.lost:
+            raise LeaseLost(f'اجاره‌ی آیتم {self.item.pk} از دست رفت')
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f'lease-{self.item.pk}')
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+# --- بیدار کردن workerها هنگام افزودن آیتم به صف ---
+# هر worker بیکار روی یک سوکت UDP محلی (127.0.0.1) منتظر می‌ماند و شماره‌ی درگاه آن را در
+# پوشه‌ی wakeup_dir می‌نویسد؛ افزودن آیتم به همه‌ی این درگاه‌ها یک بسته می‌فرستد. روی
+# PostgreSQL علاوه بر آن LISTEN/NOTIFY هم استفاده می‌شود تا workerهای سرورهای دیگر هم بیدار
+# شوند. اگر هیچ کانالی در دسترس نباشد، صف با فاصله‌ی رو به افزایش (backoff) بررسی می‌شود.
+
+NOTIFY_CHANNEL = 'ocr_scan_queue'
+
+
+def wakeup_dir():
+    return queue_settings().get('wakeup_dir') or os.path.join(settings.BASE_DIR, 'ocr_queue_wakeup')
+
+
+def notify_workers():
+    """بیدار کردن workerهای منتظر (محلی و، روی PostgreSQL، همه‌ی سرورها)"""
+    directory = wakeup_dir()
+    if os.path.isdir(directory):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(directory):
+                if not name.endswith('.port'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    with open(path) as f:
+                        port = int(f.read().strip())
+                    sock.sendto(b'1', ('127.0.0.1', port))
+                except (OSError, ValueError):
+                    # فایل worker متوقف‌شده
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        finally:
+            sock.close()
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'NOTIFY {NOTIFY_CHANNEL}')
+
+
+def size_lane(document):
+    """مسیر فایل کوچک (0) یا عادی (1) براساس حجم فایل"""
+    try:
+        size = document.original_file.size
+    except (OSError, ValueError):
+        return 1
+    return 0 if size <= queue_settings()['small_file_bytes'] else 1
+
+
+def next_fair_seq(person):
+    """نوبت آیتم بعدی شخص: یکی پس از آخرین آیتم در انتظار او، و نه زودتر از سر صف
+
+    آیتم‌های یک آپلود انبوه نوبت‌های پشت‌سرهم می‌گیرند و اولین آیتم شخص دیگری که بعداً
+    می‌رسد نوبت سر صف + 1 را می‌گیرد؛ بنابراین workerها بین اشخاص چرخشی کار می‌کنند.
+    """
+    waiting = ScanQueue.objects.filter(status__in=['pending', 'processing'])
+    head = waiting.aggregate(seq=Min('fair_seq'))['seq'] or 0
+    last = waiting.filter(person=person).aggregate(seq=Max('fair_seq'))['seq'] or 0
+    return max(head, last) + 1
+
+
+def enqueue(document, priority=0):
+    """افزودن سند به صف اسکن؛ workerها پس از commit تراکنش بیدار می‌شوند"""
+    item = ScanQueue.objects.create(
+        document=document,
+        priority=priority,
+        person=document.person,
+        fair_seq=next_fair_seq(document.person),
+        size_lane=size_lane(document),
+    )
+    transaction.on_commit(notify_workers)
+    return item
+
+
+def queue_position(item):
+    """موقعیت زنده‌ی آیتم در انتظار (1 = بعدی)؛ برای آیتم‌های غیر در انتظار None
+
+    تعداد آیتم‌های در انتظاری که به ترتیب CLAIM_ORDER جلوتر هستند از روی ایندکس شمرده می‌شود.
+    """
+    if item.status != 'pending':
+        return None
+    same_priority = Q(priority=item.priority)
+    same_seq = same_priority & Q(fair_seq=item.fair_seq)
+    same_lane = same_seq & Q(size_lane=item.size_lane)
+    ahead = (
+        Q(priority__gt=item.priority) |
+        (same_priority & Q(fair_seq__lt=item.fair_seq)) |
+        (same_seq & Q(size_lane__lt=item.size_lane)) |
+        (same_lane & Q(created_at__lt=item.created_at)) |
+        (same_lane & Q(created_at=item.created_at, pk__lt=item.pk))
+    )
+    return ScanQueue.objects.filter(ahead, status='pending').count() + 1
+
+
+class QueueWaiter:
+    """انتظار worker بیکار تا رسیدن اعلان افزودن آیتم یا پایان فاصله‌ی backoff
+
+    فاصله‌ی بررسی صف از poll_min_seconds شروع و با هر انتظار بی‌نتیجه دو برابر می‌شود تا
+    poll_max_seconds؛ با برداشتن آیتم (reset) دوباره به حداقل برمی‌گردد. همین بررسی دوره‌ای
+    آیتم‌های با اجاره‌ی منقضی‌شده را هم پیدا می‌کند.
+    """
+
+    def __init__(self, name, log=print):
+        options = queue_settings()
+        self.poll_min = options['poll_min_seconds']
+        self.poll_max = options['poll_max_seconds']
+        self.interval = self.poll_min
+        self.log = log
+        self._socket = None
+        self._port_file = None
+        self._listener = None
+
+        try:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.bind(('127.0.0.1', 0))
+            self._socket.setblocking(False)
+            os.makedirs(wakeup_dir(), exist_ok=True)
+            safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+            self._port_file = os.path.join(wakeup_dir(), f'{safe_name}.port')
+            with open(self._port_file, 'w') as f:
+                f.write(str(self._socket.getsockname()[1]))
+        except OSError as e:
+            self.log(f"⚠️ کانال محلی بیدارباش در دسترس نیست ({e})؛ صف با backoff بررسی می‌شود")
+            self._close_socket()
+
+        if connection.vendor == 'postgresql':
+            try:
+                self._listen()
+            except Exception as e:
+                self.log(f"⚠️ LISTEN روی PostgreSQL ممکن نشد ({e})")
+                self._listener = None
+
+    def _listen(self):
+        # اتصال جداگانه با autocommit تا LISTEN با تراکنش‌های worker تداخل نداشته باشد
+        from django.db import connections
+
+        self._listener = connections.create_connection('default')
+        self._listener.ensure_connection()
+        self._listener.set_autocommit(True)
+        with self._listener.cursor() as cursor:
+            cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+
+    def _drain_listener(self):
+        raw = self._listener.connection
+        if hasattr(raw, 'poll'):
+            # psycopg2
+            raw.poll()
+            raw.notifies.clear()
+        else:
+            # psycopg 3
+            for _ in raw.notifies(timeout=0):
+                pass
+
+    def _close_socket(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._port_file:
+            try:
+                os.remove(self._port_file)
+            except OSError:
+                pass
+            self._port_file = None
+
+    def reset(self):
+        self.interval = self.poll_min
+
+    def wait(self):
+        """انتظار تا اعلان یا پایان فاصله‌ی فعلی؛ True اگر اعلان رسیده باشد"""
+        sources = []
+        if self._socket is not None:
+            sources.append(self._socket)
+        if self._listener is not None and self._listener.connection is not None:
+            sources.append(self._listener.connection.fileno())
+
+        timeout = self.interval
+        self.interval = min(self.interval * 2, self.poll_max)
+        if not sources:
+            time.sleep(timeout)
+            return False
+
+        ready, _, _ = select.select(sources, [], [], timeout)
+        if not ready:
+            return False
+
+        if self._socket is not None:
+            try:
+                while self._socket.recv(64):
+                    pass
+            except (BlockingIOError, OSError):
+                pass
+        if self._listener is not None:
+            try:
+                self._drain_listener()
+            except Exception as e:
+                self.log(f"⚠️ اتصال LISTEN قطع شد ({e})؛ اتصال دوباره")
+                self._listener.close()
+                try:
+                    self._listen()
+                except Exception:
+                    self._listener = None
+        self.reset()
+        return True
+
+    def close(self):
+        self._close_socket()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
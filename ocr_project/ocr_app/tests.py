@@ -1,3 +1,816 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
 
-# Create your tests here.
+import cv2
+import fitz
+import numpy as np
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .autoscale import AutoscalePolicy
+from .docx_reader import iter_docx_text
+from .management.commands.ocr_worker import Command as WorkerCommand
+from .models import Document, DocumentPage, OCRResultCache, Person, ScanQueue
+from .ocr_backends import BACKENDS, OCRBackend
+from .ocr_cache import OCRCache
+from .ocr_service import OCRServiceClient, ServiceUnavailable, recv_message, send_message
+from .reader_pool import ReaderPool
+from .scan_queue import (QueueWaiter, claim_next, enqueue, finish, next_fair_seq, notify_workers, queue_position,
+                         renew_lease)
+from .universal_ocr import (is_blank_page, iter_pdf_pages, merge_tile_results, ocr_image_tiled,
+                           read_image_for_ocr)
+from .text_utils import detect_encoding, iter_text_file, read_text_file
+
+
+class ScanQueueTests(TestCase):
+    """برداشتن اتمی، اجاره، اولویت، مسیر فایل کوچک و نوبت چرخشی اشخاص"""
+
+    def setUp(self):
+        self.ali = Person.objects.create(first_name='علی', last_name='احمدی', national_id='0000000001',
+                                         case_description='-')
+        self.sara = Person.objects.create(first_name='سارا', last_name='رضایی', national_id='0000000002',
+                                          case_description='-')
+
+    def add(self, person, name, **fields):
+        document = Document.objects.create(person=person, file_name=name, file_type='pdf')
+        return ScanQueue.objects.create(document=document, person=person, **fields)
+
+    def claim_all(self, worker_id='w', **kwargs):
+        names = []
+        while (item := claim_next(worker_id, **kwargs)) is not None:
+            names.append(item.document.file_name)
+        return names
+
+    def test_claim_sets_lease(self):
+        item = self.add(self.ali, 'a.pdf')
+        claimed = claim_next('w1', lease_seconds=60)
+        self.assertEqual(claimed.pk, item.pk)
+        self.assertEqual(claimed.status, 'processing')
+        self.assertEqual(claimed.worker_id, 'w1')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertGreater(claimed.lease_expires_at, timezone.now())
+        self.assertIsNone(claim_next('w2'))
+
+    def test_expired_lease_is_reclaimed(self):
+        item = self.add(self.ali, 'a.pdf')
+        claim_next('w1', lease_seconds=60)
+        ScanQueue.objects.filter(pk=item.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        claimed = claim_next('w2', lease_seconds=60)
+        self.assertEqual(claimed.pk, item.pk)
+        self.assertEqual(claimed.worker_id, 'w2')
+        # worker قبلی دیگر نمی‌تواند اجاره را تمدید یا وضعیت را ثبت کند
+        self.assertFalse(renew_lease(item, 'w1'))
+        self.assertFalse(finish(item, 'w1', 'completed'))
+        self.assertTrue(finish(item, 'w2', 'completed'))
+        self.assertEqual(ScanQueue.objects.get(pk=item.pk).status, 'completed')
+
+    @override_settings(OCR_QUEUE={'max_attempts': 2})
+    def test_item_fails_after_max_attempts(self):
+        item = self.add(self.ali, 'a.pdf')
+        for worker_id in ('w1', 'w2'):
+            self.assertEqual(claim_next(worker_id).pk, item.pk)
+            ScanQueue.objects.filter(pk=item.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(claim_next('w3'))
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'failed')
+        self.assertEqual(item.attempts, 2)
+
+    def test_concurrent_claims_take_different_items(self):
+        first = self.add(self.ali, 'a.pdf')
+        second = self.add(self.ali, 'b.pdf')
+        raced = {}
+
+        def other_worker_claims_first(execute, sql, params, many, context):
+            # worker دیگری بین SELECT و UPDATE همین worker همان آیتم را برمی‌دارد
+            if not raced and sql.startswith('UPDATE') and '"worker_id"' in sql:
+                raced['item'] = None
+                raced['item'] = claim_next('w2')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(other_worker_claims_first):
+            claimed = claim_next('w1')
+
+        self.assertEqual(raced['item'].pk, first.pk)
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(ScanQueue.objects.get(pk=first.pk).worker_id, 'w2')
+        self.assertEqual(ScanQueue.objects.get(pk=second.pk).worker_id, 'w1')
+
+    def test_priority_is_claimed_first(self):
+        self.add(self.ali, 'normal.pdf')
+        self.add(self.ali, 'high.pdf', priority=5)
+        self.add(self.ali, 'urgent.pdf', priority=10)
+        self.assertEqual(self.claim_all(), ['urgent.pdf', 'high.pdf', 'normal.pdf'])
+
+    def test_small_file_lane(self):
+        self.add(self.ali, 'big.pdf', size_lane=1)
+        self.add(self.ali, 'small.pdf', size_lane=0)
+        self.assertEqual(self.claim_all(lane=0), ['small.pdf'])
+        self.assertEqual(self.claim_all(lane=0), [])
+        self.assertEqual(self.claim_all(), ['big.pdf'])
+
+    def test_round_robin_between_people(self):
+        # آپلود انبوه علی و سپس دو سند سارا: سارا از نوبت بعدی سر صف وارد چرخش می‌شود
+        for i in range(4):
+            enqueue(Document.objects.create(person=self.ali, file_name=f'ali{i}.pdf', file_type='pdf'))
+        for i in range(2):
+            enqueue(Document.objects.create(person=self.sara, file_name=f'sara{i}.pdf', file_type='pdf'))
+        self.assertEqual(self.claim_all(),
+                         ['ali0.pdf', 'ali1.pdf', 'sara0.pdf', 'ali2.pdf', 'sara1.pdf', 'ali3.pdf'])
+
+    def test_next_fair_seq(self):
+        self.assertEqual(next_fair_seq(self.ali), 1)
+        self.add(self.ali, 'a1.pdf', fair_seq=1)
+        self.add(self.ali, 'a2.pdf', fair_seq=2)
+        self.assertEqual(next_fair_seq(self.ali), 3)
+        self.assertEqual(next_fair_seq(self.sara), 2)
+        # آیتم‌های تمام‌شده نوبت را جلو نمی‌برند
+        self.add(self.sara, 'old.pdf', fair_seq=50, status='completed')
+        self.assertEqual(next_fair_seq(self.sara), 2)
+
+    def test_queue_position_follows_claim_order(self):
+        items = [
+            enqueue(Document.objects.create(person=self.ali, file_name='ali0.pdf', file_type='pdf')),
+            enqueue(Document.objects.create(person=self.ali, file_name='ali1.pdf', file_type='pdf')),
+            enqueue(Document.objects.create(person=self.sara, file_name='sara.pdf', file_type='pdf')),
+            enqueue(Document.objects.create(person=self.sara, file_name='urgent.pdf', file_type='pdf'),
+                    priority=10),
+        ]
+        positions = {item.document.file_name: queue_position(item) for item in items}
+        self.assertEqual(positions, {'urgent.pdf': 1, 'ali0.pdf': 2, 'ali1.pdf': 3, 'sara.pdf': 4})
+
+        claimed = claim_next('w')
+        self.assertEqual(claimed.document.file_name, 'urgent.pdf')
+        self.assertIsNone(queue_position(claimed))
+        items[0].refresh_from_db()
+        self.assertEqual(queue_position(items[0]), 1)
+
+
+def docx_xml(body):
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+            ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+            ' xmlns:v="urn:schemas-microsoft-com:vml"'
+            ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+            f'<w:body>{body}</w:body></w:document>')
+
+
+def text_box(*paragraphs):
+    content = ''.join(paragraph(text) for text in paragraphs)
+    return f'<w:txbxContent>{content}</w:txbxContent>'
+
+
+def paragraph(text):
+    return f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+
+def cell(text='', merge=None):
+    properties = f'<w:tcPr><w:vMerge w:val="{merge}"/></w:tcPr>' if merge else ''
+    return f'<w:tc>{properties}{paragraph(text) if text else "<w:p/>"}</w:tc>'
+
+
+class QueueWaiterTests(SimpleTestCase):
+    """بیدار شدن worker بیکار با اعلان UDP و backoff بررسی صف در نبود اعلان"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        overrides = override_settings(OCR_QUEUE={
+            'wakeup_dir': self.directory, 'poll_min_seconds': 0.05, 'poll_max_seconds': 0.2,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.waiter = QueueWaiter('host:1:abc', log=lambda message: None)
+        self.addCleanup(self.waiter.close)
+
+    def test_notify_wakes_waiting_worker(self):
+        self.assertEqual(os.listdir(self.directory), ['host_1_abc.port'])
+        notify_workers()
+        notify_workers()
+        self.assertTrue(self.waiter.wait())
+        # چند اعلان پیاپی یک بیدارباش است
+        self.assertFalse(self.waiter.wait())
+
+    def test_backoff_doubles_until_reset(self):
+        intervals = []
+        for _ in range(4):
+            intervals.append(self.waiter.interval)
+            self.assertFalse(self.waiter.wait())
+        self.assertEqual(intervals, [0.05, 0.1, 0.2, 0.2])
+        self.waiter.reset()
+        self.assertEqual(self.waiter.interval, 0.05)
+
+    def test_stale_port_files_are_removed(self):
+        with open(os.path.join(self.directory, 'gone.port'), 'w') as f:
+            f.write('')
+        notify_workers()
+        self.assertEqual(os.listdir(self.directory), ['host_1_abc.port'])
+        self.waiter.close()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class AutoscalePolicyTests(SimpleTestCase):
+    """افزایش سریع با فاصله‌ی cooldown، محافظ‌های پردازنده و حافظه و کاهش با تأخیر"""
+
+    IDLE = {'cpu_percent': 20, 'available_memory_mb': 8000}
+
+    def setUp(self):
+        self.now = 0
+        self.policy = AutoscalePolicy({
+            'min_workers': 1, 'max_workers': 8, 'items_per_worker': 10, 'max_wait_seconds': 120,
+            'scale_up_step': 2, 'scale_up_cooldown': 30, 'scale_down_delay': 300,
+            'max_cpu_percent': 90, 'min_available_memory_mb': 1024,
+        }, clock=lambda: self.now)
+
+    def queue(self, pending, processing=0, oldest_wait=0.0):
+        return {'pending': pending, 'processing': processing, 'oldest_wait': oldest_wait}
+
+    def decide(self, current, queue, **system):
+        return self.policy.decide(current, queue, {**self.IDLE, **system})[0]
+
+    def test_scale_up_in_steps_after_cooldown(self):
+        busy = self.queue(60)
+        self.assertEqual(self.decide(1, busy), 3)
+        self.now = 10
+        self.assertEqual(self.decide(3, busy), 3)
+        self.now = 40
+        self.assertEqual(self.decide(3, busy), 5)
+        self.now = 80
+        # سقف max_workers
+        self.assertEqual(self.decide(5, self.queue(500)), 7)
+        self.now = 120
+        self.assertEqual(self.decide(7, self.queue(500)), 8)
+
+    def test_long_wait_adds_a_worker(self):
+        self.assertEqual(self.decide(2, self.queue(3, processing=2)), 2)
+        self.assertEqual(self.decide(2, self.queue(3, processing=2, oldest_wait=300)), 3)
+
+    def test_guards_block_scale_up(self):
+        busy = self.queue(60)
+        self.assertEqual(self.decide(1, busy, cpu_percent=95), 1)
+        self.assertEqual(self.decide(1, busy, available_memory_mb=800), 1)
+        # بدون psutil محافظی اعمال نمی‌شود
+        self.assertEqual(self.decide(1, busy, cpu_percent=None, available_memory_mb=None), 3)
+
+    def test_severe_memory_shortage_scales_down(self):
+        self.assertEqual(self.decide(4, self.queue(60), available_memory_mb=300), 3)
+        self.assertEqual(self.decide(1, self.queue(60), available_memory_mb=300), 1)
+
+    def test_scale_down_after_stable_delay(self):
+        quiet = self.queue(0, processing=1)
+        self.assertEqual(self.decide(3, quiet), 3)
+        self.now = 200
+        self.assertEqual(self.decide(3, quiet), 3)
+        self.now = 300
+        self.assertEqual(self.decide(3, quiet), 2)
+        # هر کاهش یک worker و پس از تأخیر دوباره
+        self.now = 400
+        self.assertEqual(self.decide(2, quiet), 2)
+        # افزایش دوباره‌ی بار شمارش تأخیر را از نو شروع می‌کند
+        self.assertEqual(self.decide(2, self.queue(20)), 2)
+        self.now = 650
+        self.assertEqual(self.decide(2, quiet), 2)
+
+    def test_min_workers(self):
+        self.assertEqual(self.decide(0, self.queue(0)), 1)
+        self.now = 1000
+        self.assertEqual(self.decide(1, self.queue(0)), 1)
+
+
+class DocxReaderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_docx(self, parts):
+        path = os.path.join(self.directory, 'test.docx')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name, xml in parts.items():
+                archive.writestr(name, xml)
+        return path
+
+    def test_vertical_merge_is_not_repeated(self):
+        table = ('<w:tbl>'
+                 f'<w:tr>{cell("ادغام", merge="restart")}{cell("ردیف ۱")}</w:tr>'
+                 f'<w:tr>{cell(merge="continue")}{cell("ردیف ۲")}</w:tr>'
+                 '</w:tbl>')
+        path = self.write_docx({'word/document.xml': docx_xml(paragraph('متن') + table)})
+        self.assertEqual(list(iter_docx_text(path)), ['متن', 'ادغام', 'ردیف ۱', 'ردیف ۲'])
+
+    def test_text_box_keeps_surrounding_paragraph(self):
+        body = ('<w:p><w:r><w:t xml:space="preserve">پیش از جعبه </w:t></w:r>'
+                f'<w:r><w:pict><v:shape><v:textbox>{text_box("درون جعبه")}</v:textbox></v:shape></w:pict></w:r>'
+                '<w:r><w:t>پس از جعبه</w:t></w:r></w:p>')
+        path = self.write_docx({'word/document.xml': docx_xml(body)})
+        self.assertEqual(list(iter_docx_text(path)), ['پیش از جعبه پس از جعبه', 'درون جعبه'])
+
+    def test_text_box_fallback_is_not_repeated(self):
+        # Word جعبه‌ی متن را دو بار ذخیره می‌کند: DrawingML در Choice و VML در Fallback
+        box = ('<mc:AlternateContent>'
+               f'<mc:Choice Requires="wps"><w:drawing><wps:txbx>{text_box("جعبه", "خط دوم")}</wps:txbx>'
+               '</w:drawing></mc:Choice>'
+               f'<mc:Fallback><w:pict><v:shape><v:textbox>{text_box("جعبه", "خط دوم")}</v:textbox>'
+               '</v:shape></w:pict></mc:Fallback>'
+               '</mc:AlternateContent>')
+        body = (f'<w:p><w:r><w:t>متن</w:t></w:r><w:r>{box}</w:r></w:p>'
+                f'<w:tbl><w:tr><w:tc><w:p><w:r>{box}</w:r></w:p></w:tc></w:tr></w:tbl>')
+        path = self.write_docx({'word/document.xml': docx_xml(body)})
+        self.assertEqual(list(iter_docx_text(path)), ['متن', 'جعبه', 'خط دوم', 'جعبه\nخط دوم'])
+
+    def test_headers_body_and_footers_in_order(self):
+        path = self.write_docx({
+            'word/footer1.xml': docx_xml(paragraph('پانویس')),
+            'word/document.xml': docx_xml(paragraph('بدنه')),
+            'word/header10.xml': docx_xml(paragraph('سربرگ ۱۰')),
+            'word/header2.xml': docx_xml(paragraph('سربرگ ۲')),
+        })
+        self.assertEqual(list(iter_docx_text(path)), ['سربرگ ۲', 'سربرگ ۱۰', 'بدنه', 'پانویس'])
+
+
+class TextFileTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, data):
+        path = os.path.join(self.directory, 'test.txt')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_detect_encoding(self):
+        self.assertEqual(detect_encoding('سلام'.encode('utf-8-sig')), 'utf-8-sig')
+        self.assertEqual(detect_encoding('سلام'.encode('utf-16')), 'utf-16')
+        # کاراکتر چندبایتی بریده‌شده در انتهای نمونه
+        self.assertEqual(detect_encoding('سلام'.encode('utf-8')[:-1]), 'utf-8')
+        self.assertEqual(detect_encoding('سلام دنيا'.encode('cp1256')), 'windows-1256')
+        self.assertEqual(detect_encoding(b'plain ascii'), 'windows-1256')
+
+    def test_detect_encoding_mostly_ascii_persian(self):
+        log = b'2024-01-01 12:00:00 INFO ' * 40 + 'پرونده ثبت شد'.encode('cp1256') + b'\r\n'
+        self.assertEqual(detect_encoding(log), 'windows-1256')
+
+    def test_persian_after_ascii_sample(self):
+        # ابتدای لاگ بزرگ بیش از sample_size بایت تمام ASCII است
+        head = b'2024-01-01 12:00:00 INFO request served\r\n' * 2500
+        for encoding in ('cp1256', 'utf-8'):
+            path = self.write(head + 'پرونده ثبت شد\r\n'.encode(encoding) + b'done\r\n')
+            text, truncated = read_text_file(path)
+            self.assertFalse(truncated)
+            self.assertTrue(text.endswith('INFO request served\nپرونده ثبت شد\ndone\n'), encoding)
+            self.assertNotIn('\ufffd', text)
+
+    def test_crlf_split_across_chunks(self):
+        path = self.write(b'ab\r\ncd\r\nef')
+        chunks = list(iter_text_file(path, chunk_size=3, sample_size=3))
+        self.assertEqual(''.join(chunks), 'ab\ncd\nef')
+
+    def test_windows_1256_is_normalized(self):
+        path = self.write('علي و كتاب\r\n'.encode('cp1256'))
+        self.assertEqual(read_text_file(path), ('علی و کتاب\n', False))
+
+    def test_truncation(self):
+        path = self.write(b'ab\r\ncd\r\nef')
+        self.assertEqual(read_text_file(path, max_bytes=4), ('ab\n', True))
+        self.assertEqual(read_text_file(path, max_bytes=100), ('ab\ncd\nef', False))
+        self.assertEqual(''.join(iter_text_file(path, max_bytes=3, chunk_size=2, sample_size=2)), 'ab\n')
+
+
+class FakeEngine:
+    """موتور ساختگی با نتیجه‌ی ثابت که تعداد اجرای OCR را می‌شمارد"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def config_signature(self, text_type="auto", backend=None, languages=None, reader_options=None):
+        return {'text_type': text_type, 'backend': backend}
+
+    def extract_text(self, file_path, text_type="auto", **options):
+        self.calls += 1
+        return dict(self.result)
+
+
+class OCRCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = OCRCache(max_entries=3, max_bytes=1000)
+
+    def put(self, name, text='متن', minutes_ago=0):
+        self.cache.put(name, 'config', {'text': text, 'type': 'printed', 'confidence': 0.9, 'file_type': 'image'})
+        OCRResultCache.objects.filter(file_hash=name).update(
+            last_used_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+
+    def cached_names(self):
+        return set(OCRResultCache.objects.values_list('file_hash', flat=True))
+
+    def test_hits_and_misses(self):
+        self.assertIsNone(self.cache.get('a', 'config'))
+        self.put('a')
+        self.assertEqual(self.cache.get('a', 'config')['text'], 'متن')
+        self.assertIsNone(self.cache.get('a', 'other-config'))
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 2, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 1 / 3)
+        self.assertEqual(stats['total_hits'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.put('old', minutes_ago=30)
+        self.put('used', minutes_ago=20)
+        self.put('new', minutes_ago=10)
+        # برخورد زمان آخرین استفاده را تازه می‌کند
+        self.cache.get('used', 'config')
+        self.put('newest')
+        self.assertEqual(self.cached_names(), {'used', 'new', 'newest'})
+
+    def test_eviction_by_size(self):
+        self.put('a', 'x' * 400, minutes_ago=3)
+        self.put('b', 'x' * 400, minutes_ago=2)
+        self.put('c', 'x' * 400)
+        self.assertEqual(self.cached_names(), {'b', 'c'})
+        self.assertLessEqual(self.cache.stats()['size_bytes'], 1000)
+
+    def test_extract_text_caches_by_content(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        first, second = os.path.join(directory, 'a.png'), os.path.join(directory, 'b.png')
+        for path in (first, second):
+            with open(path, 'wb') as f:
+                f.write(b'same content')
+
+        engine = FakeEngine({'text': 'سلام', 'type': 'printed', 'confidence': 0.8, 'file_type': 'image'})
+        self.assertNotIn('cached', self.cache.extract_text(engine, first))
+        # فایل دیگری با همان محتوا از کش خوانده می‌شود
+        self.assertTrue(self.cache.extract_text(engine, second)['cached'])
+        self.assertEqual(engine.calls, 1)
+        # تنظیمات متفاوت کلید دیگری دارد
+        self.cache.extract_text(engine, first, text_type='handwritten')
+        self.assertEqual(engine.calls, 2)
+
+    def test_errors_are_not_cached(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'a.png')
+        with open(path, 'wb') as f:
+            f.write(b'content')
+
+        engine = FakeEngine({'text': '', 'type': 'error', 'error': 'boom'})
+        self.cache.extract_text(engine, path)
+        self.cache.extract_text(engine, path)
+        self.assertEqual(engine.calls, 2)
+        self.assertEqual(OCRResultCache.objects.count(), 0)
+
+
+class ServiceUnavailableTests(TestCase):
+    """قطع بودن سرویس OCR خطای سند نیست و آیتم صف از دست نمی‌رود"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.client = OCRServiceClient(os.path.join(self.directory, 'missing.sock'))
+
+    def test_client_raises_service_unavailable(self):
+        with self.assertRaises(ServiceUnavailable):
+            self.client.extract_text(os.path.join(self.directory, 'a.png'))
+        self.assertFalse(self.client.ping())
+
+    def test_worker_returns_item_to_queue(self):
+        person = Person.objects.create(first_name='علی', last_name='احمدی', national_id='0000000001',
+                                       case_description='-')
+        document = Document(person=person, file_name='a.png', file_type='image')
+        with self.settings(MEDIA_ROOT=self.directory):
+            document.original_file.save('a.png', ContentFile(b'image'))
+            ScanQueue.objects.create(document=document, person=person)
+
+            command = WorkerCommand(stdout=io.StringIO())
+            command.ocr_engine = self.client
+            command.worker_id = 'w'
+            command.lease_seconds = 60
+            item = claim_next('w')
+            with self.assertRaises(ServiceUnavailable):
+                command.process_queue_item(item)
+
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.worker_id, item.attempts), ('pending', '', 0))
+        self.assertIsNone(item.lease_expires_at)
+
+
+class StolenLeaseEngine(FakeEngine):
+    """موتور ساختگی که پس از صفحه‌ی اول اجاره‌ی آیتم را به worker دیگری می‌دهد"""
+
+    def __init__(self, item, wait):
+        super().__init__({'text': 'done', 'type': 'pdf', 'confidence': 0.9})
+        self.item = item
+        self.wait = wait
+
+    def extract_text(self, file_path, text_type="auto", on_page=None, **options):
+        on_page({'page': 1, 'text': 'one', 'source': 'ocr', 'confidence': 0.9})
+        ScanQueue.objects.filter(pk=self.item.pk).update(worker_id='other')
+        time.sleep(self.wait)
+        on_page({'page': 2, 'text': 'two', 'source': 'ocr', 'confidence': 0.9})
+        return super().extract_text(file_path, text_type, **options)
+
+
+class LeaseLostTests(TransactionTestCase):
+    """با از دست رفتن اجاره worker نه صفحه‌ی دیگری ثبت می‌کند نه وضعیت آیتم را تغییر می‌دهد"""
+
+    def test_worker_stops_when_lease_is_lost(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        person = Person.objects.create(first_name='علی', last_name='احمدی', national_id='0000000001',
+                                       case_description='-')
+        document = Document(person=person, file_name='a.pdf', file_type='pdf')
+        with self.settings(MEDIA_ROOT=directory):
+            document.original_file.save('a.pdf', ContentFile(b'pdf'))
+            ScanQueue.objects.create(document=document, person=person)
+
+            command = WorkerCommand(stdout=io.StringIO())
+            command.worker_id = 'w'
+            # تمدید هر ۰٫۱ ثانیه؛ موتور ۰٫۵ ثانیه پس از واگذاری اجاره صفحه‌ی بعد را می‌دهد
+            command.lease_seconds = 0.3
+            item = claim_next('w', command.lease_seconds)
+            command.ocr_engine = StolenLeaseEngine(item, wait=0.5)
+            command.process_queue_item(item)
+
+        self.assertEqual(list(DocumentPage.objects.values_list('page_number', flat=True)), [1])
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.worker_id), ('processing', 'other'))
+        document.refresh_from_db()
+        self.assertFalse(document.ocr_processed)
+
+
+class RectangleReader:
+    """Reader ساختگی: هر مستطیل تیره یک کلمه است و متن آن پهنای مستطیل است"""
+
+    def readtext(self, image, detail=1, **options):
+        _, binary = cv2.threshold(image, 128, 255, cv2.THRESH_BINARY_INV)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+        results = []
+        for left, top, width, height, _ in stats[1:count]:
+            box = [[left, top], [left + width, top], [left + width, top + height], [left, top + height]]
+            results.append((box, f'w{width}', 0.9))
+        return results
+
+
+def box(left, top, right, bottom):
+    return [[left, top], [right, top], [right, bottom], [left, bottom]]
+
+
+class TiledOCRTests(SimpleTestCase):
+
+    def setUp(self):
+        self.img = np.full((1000, 1000), 255, dtype=np.uint8)
+        for left, top, width in [(50, 50, 40), (350, 100, 70), (320, 500, 60), (800, 900, 80)]:
+            self.img[top:top + 30, left:left + width] = 0
+
+    def test_words_on_tile_edges_are_read_once(self):
+        # کاشی‌های ۴۰۰ پیکسلی با ۱۰۰ پیکسل هم‌پوشانی: w70 لبه‌ی کاشی اول را قطع می‌کند و
+        # w60 کامل در ناحیه‌ی هم‌پوشان دو کاشی است
+        for workers in (1, 2):
+            results = ocr_image_tiled(RectangleReader(), self.img, tile_size=400, overlap=100, workers=workers)
+            self.assertEqual([text for _, text, _ in results], ['w40', 'w70', 'w60', 'w80'])
+        self.assertEqual(results[1][0], box(350, 100, 420, 130))
+
+    def test_small_image_is_a_single_tile(self):
+        results = ocr_image_tiled(RectangleReader(), self.img[:300, :300], tile_size=400, overlap=100)
+        self.assertEqual([text for _, text, _ in results], ['w40'])
+
+    def test_merge_keeps_more_confident_duplicate(self):
+        results = merge_tile_results([
+            (box(100, 0, 200, 20), 'right', 0.9),
+            (box(0, 2, 90, 22), 'left', 0.8),
+            (box(102, 1, 201, 21), 'duplicate', 0.5),
+            (box(0, 50, 90, 70), 'second line', 0.7),
+        ])
+        self.assertEqual([text for _, text, _ in results], ['left', 'right', 'second line'])
+
+    def test_large_image_is_decoded_as_gray(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'scan.png')
+        cv2.imwrite(path, cv2.cvtColor(self.img, cv2.COLOR_GRAY2BGR))
+
+        self.assertEqual(read_image_for_ocr(path, None).ndim, 3)
+        self.assertEqual(read_image_for_ocr(path, None, gray_above_pixels=10 ** 7).ndim, 3)
+        gray = read_image_for_ocr(path, None, gray_above_pixels=10 ** 5)
+        self.assertEqual(gray.shape, (1000, 1000))
+
+
+class DetectReader:
+    """Reader ساختگی که فقط مرحله‌ی تشخیص متن دارد و فراخوانی‌های آن را می‌شمارد"""
+
+    def __init__(self, found):
+        self.found = found
+        self.calls = 0
+
+    def has_text(self, image):
+        self.calls += 1
+        return self.found
+
+
+class BlankPageTests(SimpleTestCase):
+
+    def setUp(self):
+        # کاغذ کمی نویزدار به اندازه‌ی A4 در ۱۰۰ dpi
+        rng = np.random.default_rng(0)
+        self.page = np.clip(rng.normal(235, 3, (1170, 830)), 0, 255).astype(np.uint8)
+
+    def test_empty_page(self):
+        self.assertTrue(is_blank_page(self.page, mode='ink'))
+        self.assertFalse(is_blank_page(self.page, mode=None))
+
+    def test_dust_and_edge_shadow_are_ignored(self):
+        for y, x in [(200, 150), (640, 700), (900, 300)]:
+            self.page[y:y + 2, x:x + 2] = 40
+        self.page[:, :20] = 60
+        self.page[-15:, :] = 60
+        self.assertTrue(is_blank_page(self.page, mode='ink'))
+
+    def test_short_line_is_kept(self):
+        cv2.putText(self.page, 'p. 2', (400, 600), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 0, 1)
+        self.assertFalse(is_blank_page(self.page, mode='ink'))
+
+    def test_faint_pencil_is_kept(self):
+        cv2.line(self.page, (200, 500), (500, 510), 190, 2)
+        self.assertFalse(is_blank_page(self.page, mode='ink'))
+
+    def test_detect_mode_asks_the_model_for_every_inked_page(self):
+        # صفحه‌ی پرجوهر بدون متن (مثلاً یک عکس یا طرح) فقط با تأیید مدل رد می‌شود
+        cv2.rectangle(self.page, (100, 100), (700, 900), 30, -1)
+        reader = DetectReader(found=False)
+        self.assertTrue(is_blank_page(self.page, reader, mode='detect'))
+        self.assertFalse(is_blank_page(self.page, DetectReader(found=True), mode='detect'))
+        self.assertFalse(is_blank_page(self.page, reader, mode='ink'))
+        self.assertEqual(reader.calls, 1)
+
+        # صفحه‌ی بدون جوهر به مدل داده نمی‌شود
+        empty = np.full((1170, 830), 235, dtype=np.uint8)
+        self.assertTrue(is_blank_page(empty, reader, mode='detect'))
+        self.assertEqual(reader.calls, 1)
+
+
+class SlowBackend(OCRBackend):
+    """موتور ساختگی که ساخت آن تا باز شدن release منتظر می‌ماند"""
+    name = 'test_slow'
+    started = None
+    release = None
+    created = 0
+
+    def __init__(self, languages, **options):
+        super().__init__(languages, **options)
+        type(self).created += 1
+        if options.get('slow'):
+            self.started.set()
+            self.release.wait(5)
+
+
+class ReaderPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        BACKENDS[SlowBackend.name] = SlowBackend
+        self.addCleanup(BACKENDS.pop, SlowBackend.name)
+        SlowBackend.started = threading.Event()
+        SlowBackend.release = threading.Event()
+        SlowBackend.created = 0
+        self.pool = ReaderPool(log=lambda message: None)
+
+    def test_loading_does_not_block_warm_readers(self):
+        warm = self.pool.get('test_slow', ['fa'])
+        results = []
+        loaders = [threading.Thread(target=lambda: results.append(self.pool.get('test_slow', ['fa'], {'slow': True})))
+                   for _ in range(2)]
+        for thread in loaders:
+            thread.start()
+        SlowBackend.started.wait(5)
+
+        # موتور گرم بدون انتظار برای ساخت موتور دیگر برمی‌گردد
+        started = time.monotonic()
+        self.assertIs(self.pool.get('test_slow', ['fa']), warm)
+        self.assertLess(time.monotonic() - started, 1)
+        SlowBackend.release.set()
+        for thread in loaders:
+            thread.join(5)
+
+        # درخواست‌های هم‌زمان یک کلید فقط یک بار موتور را می‌سازند
+        self.assertEqual(SlowBackend.created, 2)
+        self.assertIs(results[0], results[1])
+        self.assertEqual(len(self.pool.stats()['readers']), 2)
+
+    def test_failed_load_can_be_retried(self):
+        with self.assertRaises(ValueError):
+            self.pool.get('missing', ['fa'])
+        self.assertEqual(self.pool._loading, {})
+        self.assertIsNotNone(self.pool.get('test_slow', ['fa']))
+
+
+class CountingReader:
+    """Reader ساختگی که تصاویر را به ترتیب دریافت شماره‌گذاری می‌کند و اندازه‌ی دسته‌ها را ثبت می‌کند"""
+
+    def __init__(self):
+        self.count = 0
+        self.batches = []
+
+    def readtext(self, image, detail=1, **options):
+        self.count += 1
+        return [(box(0, 0, 10, 10), f'scan{self.count}', 0.9)]
+
+    def readtext_batched(self, images, detail=1, batch_size=1, **options):
+        self.batches.append(len(images))
+        return [self.readtext(image) for image in images]
+
+
+class PdfPagesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_pdf(self, kinds):
+        path = os.path.join(self.directory, 'test.pdf')
+        with fitz.open() as doc:
+            for number, kind in enumerate(kinds, 1):
+                page = doc.new_page(width=200, height=200)
+                if kind == 'text':
+                    page.insert_text((20, 50), f'page {number}')
+                else:
+                    page.draw_rect(fitz.Rect(20, 20, 120, 40), color=(0, 0, 0), fill=(0, 0, 0))
+            doc.save(path)
+        return path
+
+    def test_pages_are_yielded_in_order(self):
+        path = self.write_pdf(['text', 'scan', 'text', 'scan', 'scan', 'text'])
+        reader = CountingReader()
+        pages = list(iter_pdf_pages(path, reader, batch_size=2))
+
+        self.assertEqual([page['page'] for page in pages], [1, 2, 3, 4, 5, 6])
+        self.assertEqual([page['source'] for page in pages], ['text', 'ocr', 'text', 'ocr', 'ocr', 'text'])
+        self.assertEqual([page['text'].strip() for page in pages],
+                         ['page 1', 'scan1', 'page 3', 'scan2', 'scan3', 'page 6'])
+        # صفحه‌های اسکن‌شده در دسته‌های batch_size تایی OCR می‌شوند
+        self.assertEqual(reader.batches, [2])
+
+    def test_selected_pages_only(self):
+        path = self.write_pdf(['scan', 'text', 'scan'])
+        pages = list(iter_pdf_pages(path, CountingReader(), pages=[1, 2]))
+        self.assertEqual([page['page'] for page in pages], [2, 3])
+
+
+class ServiceClientPagesTests(SimpleTestCase):
+    """iter_pages کلاینت سرویس همان صفحه‌های UniversalOCR.iter_pages را برمی‌گرداند"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def iter_pages(self, responses):
+        """اجرای iter_pages مقابل سرویس ساختگی که برای درخواست، responses را می‌فرستد"""
+        path = os.path.join(self.directory, 'ocr.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        self.addCleanup(server.close)
+
+        def serve():
+            conn, _ = server.accept()
+            with conn:
+                request = recv_message(conn)
+                for response in responses:
+                    send_message(conn, dict(response, id=request['id']))
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        client = OCRServiceClient(path, timeout=10)
+        try:
+            return list(client.iter_pages(os.path.join(self.directory, 'a.png')))
+        finally:
+            client.close()
+            thread.join()
+
+    def test_single_image_yields_one_page(self):
+        pages = self.iter_pages([{'result': {'text': 'سلام', 'type': 'printed', 'confidence': 0.8,
+                                             'file_type': 'image'}}])
+        self.assertEqual(pages, [{'page': 1, 'text': 'سلام', 'confidence': 0.8, 'source': 'ocr'}])
+
+    def test_streamed_pages_are_not_repeated(self):
+        page = {'page': 1, 'text': 'متن', 'confidence': 1.0, 'source': 'text'}
+        pages = self.iter_pages([{'event': 'page', 'page': page},
+                                 {'result': {'text': 'متن', 'confidence': 1.0, 'pages': 1, 'file_type': 'pdf'}}])
+        self.assertEqual(pages, [page])
+
+    def test_completed_pdf_yields_nothing(self):
+        pages = self.iter_pages([{'result': {'text': 'متن', 'confidence': 1.0, 'pages': 3, 'file_type': 'pdf'}}])
+        self.assertEqual(pages, [])
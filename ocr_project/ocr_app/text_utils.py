@@ -0,0 +1,128 @@
+# ocr_app/text_utils.py
+# توابع سبک قالب‌بندی متن که بدون بارگذاری کتابخانه‌های OCR قابل استفاده‌اند
+import codecs
+import os
+import re
+
+
+def format_pdf_page(page_number, page_text, ocr=False):
+    """قالب خروجی هر صفحه با نشانگر شماره صفحه"""
+    if ocr:
+        return f"\n--- صفحه {page_number} (OCR) ---\n{page_text}"
+    return f"\n--- صفحه {page_number} ---\n{page_text}"
+
+
+def join_pdf_pages(pages):
+    """چسباندن صفحه‌ها به ترتیب شماره صفحه؛ pages: {شماره صفحه: {'text', 'source', ...}}"""
+    return ''.join(
+        format_pdf_page(page_number, pages[page_number]['text'], pages[page_number]['source'] == 'ocr')
+        for page_number in sorted(pages)
+    ).strip()
+
+
+# حروف عربی که به معادل فارسی یکسان می‌شوند (برای جستجوی یکدست) و حذف NUL
+PERSIAN_NORMALIZATION = str.maketrans({'ي': 'ی', 'ك': 'ک', '\x00': None})
+
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def normalize_text(text):
+    """یکسان‌سازی خط جدید، حروف عربی ی/ک و حذف کاراکتر NUL"""
+    return text.replace('\r\n', '\n').replace('\r', '\n').translate(PERSIAN_NORMALIZATION)
+
+
+def detect_encoding(sample, default='windows-1256'):
+    """تشخیص کدگذاری از نمونه‌ی ابتدای فایل: BOM، UTF-8، متن فارسی default و در آخر chardet
+
+    نمونه‌ی تمام ASCII با هر کدگذاری یکسان خوانده می‌شود و default برمی‌گرداند.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if sample.isascii():
+        return default
+
+    try:
+        # final=False: کاراکتر چندبایتی که در انتهای نمونه بریده شده خطا حساب نمی‌شود
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    # chardet متن فارسی windows-1256 را اغلب با کدگذاری‌های لاتین اشتباه می‌گیرد. نسبت فقط روی
+    # حروف غیر ASCII حساب می‌شود تا فایل‌های عمدتاً لاتین با پیام‌های فارسی (مثلاً خروجی لاگ) هم
+    # درست تشخیص داده شوند
+    letters = [char for char in sample.decode(default, errors='replace') if not char.isascii() and char.isalpha()]
+    if not letters or sum('\u0600' <= char <= '\u06ff' for char in letters) / len(letters) >= 0.5:
+        return default
+
+    try:
+        import chardet
+    except ImportError:
+        return default
+    guess = chardet.detect(sample)
+    if guess.get('encoding') and guess.get('confidence', 0) >= 0.5:
+        return guess['encoding']
+    return default
+
+
+def iter_text_file(file_path, max_bytes=None, chunk_size=1024 * 1024, sample_size=64 * 1024):
+    """خواندن تکه‌تکه‌ی فایل متنی با حافظه‌ی محدود (generator)
+
+    کدگذاری از sample_size بایت شروع‌شده از اولین بایت غیر ASCII تشخیص داده می‌شود؛ ابتدای
+    تمام ASCII فایل (مثلاً سطرهای لاتین یک لاگ بزرگ) تصمیم را تا رسیدن به اولین متن فارسی
+    عقب می‌اندازد. هر تکه هنگام خواندن رمزگشایی و یکسان‌سازی می‌شود و در صورت تعیین
+    max_bytes بقیه‌ی فایل خوانده نمی‌شود.
+    """
+    with open(file_path, 'rb') as f:
+        remaining = max_bytes
+
+        def read(size):
+            nonlocal remaining
+            if remaining is not None:
+                size = min(size, remaining)
+            data = f.read(size) if size > 0 else b''
+            if remaining is not None:
+                remaining -= len(data)
+            return data
+
+        decoder = None
+        pending_cr = ''
+        data = read(sample_size)
+        while data:
+            if decoder is None:
+                non_ascii = _NON_ASCII.search(data)
+                if non_ascii is None:
+                    text = data.decode('ascii')
+                else:
+                    # نمونه‌ی تشخیص از اولین بایت غیر ASCII؛ اگر تا پایان تکه کوتاه است تکمیل می‌شود
+                    start = non_ascii.start()
+                    if len(data) - start < sample_size:
+                        data += read(sample_size - (len(data) - start))
+                    decoder = codecs.getincrementaldecoder(detect_encoding(data[start:]))(errors='replace')
+                    text = decoder.decode(data)
+            else:
+                text = decoder.decode(data)
+            text = pending_cr + text
+            # \r انتهای تکه ممکن است نیمه‌ی اول \r\n باشد
+            pending_cr = '\r' if text.endswith('\r') else ''
+            if pending_cr:
+                text = text[:-1]
+            yield normalize_text(text)
+            data = read(chunk_size)
+
+        tail = decoder.decode(b'', final=True) if decoder is not None else ''
+        yield normalize_text(pending_cr + tail)
+
+
+def read_text_file(file_path, max_bytes=None, chunk_size=1024 * 1024):
+    """متن یکسان‌شده‌ی فایل و اینکه به دلیل max_bytes کوتاه شده است یا نه"""
+    text = ''.join(iter_text_file(file_path, max_bytes, chunk_size))
+    truncated = max_bytes is not None and os.path.getsize(file_path) > max_bytes
+    return text, truncated
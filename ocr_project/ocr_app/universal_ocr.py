@@ -1,14 +1,97 @@
-import easyocr
 import cv2
 import numpy as np
 import os
 import fitz
 from PIL import Image
-import io
 import magic
-import tempfile
-import shutil
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import gc
+import multiprocessing
+import time
+
+from .docx_reader import iter_docx_text
+from .ocr_backends import DEFAULT_LANGUAGES, create_backend
+from .reader_pool import ReaderPool, reader_key
+from .text_utils import join_pdf_pages, read_text_file
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# تعداد صفحه‌های اسکن‌شده‌ی PDF که با هم به OCR داده می‌شوند
+PDF_OCR_BATCH_SIZE = 4
+
+# حداقل تعداد صفحه برای استفاده از پردازش موازی PDF
+PDF_PARALLEL_MIN_PAGES = 16
+
+# رندر صفحه‌های اسکن‌شده‌ی PDF: ارتفاع هدف متن (پیکسل)، اندازه‌ی فرضی متن بدنه (پوینت)
+# و سقف تعداد پیکسل هر صفحه
+PDF_TARGET_TEXT_HEIGHT = 32
+PDF_BODY_TEXT_POINTS = 10
+PDF_MAX_PIXELS = 12_000_000
+
+# مساحت صفحه‌ی A4 به پوینت
+A4_AREA_POINTS = 595 * 842
+
+# تصاویر بزرگ‌تر از این تعداد پیکسل به کاشی‌های هم‌پوشان تقسیم می‌شوند
+TILE_MAX_PIXELS = 16_000_000
+TILE_SIZE = 2048
+TILE_OVERLAP = 256
+
+# JPEGهای بزرگ‌تر از این تعداد پیکسل با وضوح کمتر (۱/۲، ۱/۴ یا ۱/۸) رمزگشایی می‌شوند،
+# تا جایی که ارتفاع تخمینی متن از IMAGE_TARGET_TEXT_HEIGHT پیکسل کمتر نشود
+IMAGE_REDUCE_MIN_PIXELS = 12_000_000
+IMAGE_TARGET_TEXT_HEIGHT = 32
+# حداقل تعداد اجزای متنی برای اطمینان به تخمین ارتفاع متن
+TEXT_HEIGHT_MIN_COMPONENTS = 30
+
+JPEG_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+JPEG_REDUCED_GRAY_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# حالت دومرحله‌ای: خواندن کل تصویر با مقیاس COARSE_SCALE و بازخوانی نواحی با اطمینان کمتر از
+# COARSE_REFINE_CONFIDENCE روی تصویر با وضوح کامل (فقط برای تصاویری که ضلع بزرگشان از
+# COARSE_MIN_SIDE بیشتر است)
+COARSE_SCALE = 0.5
+COARSE_REFINE_CONFIDENCE = 0.6
+COARSE_MIN_SIDE = 1600
+COARSE_BOX_PADDING = 4
+
+# آستانه‌های EasyOCR براساس نوع متن: (text_threshold, low_text)
+TEXT_THRESHOLDS = {
+    # برای دستنویس: آستانه پایین‌تر، حساسیت بیشتر
+    'handwritten': (0.2, 0.1),
+    # برای تایپی: آستانه بالاتر، دقت بیشتر
+    'printed': (0.4, 0.3),
+}
+
+# حداقل اطمینان برای پذیرش متن OCR صفحه‌های PDF
+PDF_MIN_CONFIDENCE = 0.2
+
+# تشخیص صفحه‌ی سفید پیش از OCR: 'ink' (صفحه‌های بدون جوهر، با چشم‌پوشی از لکه‌ها و حاشیه)،
+# 'detect' (به‌علاوه‌ی اجرای فقط مدل تشخیص متن روی تصویر کوچک برای صفحه‌های جوهردار) یا None (غیرفعال)
+BLANK_PAGE_CHECK = 'ink'
+BLANK_CHECK_SIZE = 1000
+# پیکسل جوهر: اختلاف (تیره‌تر یا روشن‌تر) از پس‌زمینه بیش از max(BLANK_INK_DELTA، BLANK_NOISE_FACTOR
+# برابر نویز کاغذ)؛ مداد کم‌رنگ هم جوهر حساب می‌شود ولی خط کم‌رنگ پشت صفحه نه
+BLANK_INK_DELTA = 25
+BLANK_NOISE_FACTOR = 4
+# سهم هر لبه‌ی صفحه که کنار گذاشته می‌شود (سایه‌ی لبه‌ی کاغذ و جای منگنه در اسکن)
+BLANK_MARGIN = 0.03
+# لکه‌های جوهر کوچک‌تر از این تعداد پیکسل (در اندازه‌ی BLANK_CHECK_SIZE) گرد و غبار حساب می‌شوند
+BLANK_MIN_SPECK = 6
+
+# سقف حجم خوانده‌شده از فایل‌های متنی (بایت، None = بدون سقف)
+TEXT_MAX_BYTES = 50 * 1024 * 1024
 
 
 def detect_file_type(file_path):
@@ -42,135 +125,555 @@ def detect_file_type(file_path):
             return 'unknown'
 
 
-def safe_image_read(image_path):
-    """خواندن ایمن تصویر با مدیریت مسیرهای فارسی"""
+def safe_image_read(image_path, gray=False):
+    """خواندن ایمن تصویر با مدیریت مسیرهای فارسی
+
+    با gray=True تصویر مستقیماً خاکستری رمزگشایی می‌شود (یک بایت برای هر پیکسل، بدون
+    ساختن نسخه‌ی رنگی کامل).
+    """
+    flags = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
     try:
         # روش ۱: خواندن مستقیم
-        img = cv2.imread(image_path)
+        img = cv2.imread(image_path, flags)
         if img is not None:
             return img
 
-        # روش ۲: استفاده از PIL و تبدیل به OpenCV
+        # روش ۲: خواندن بایت‌ها و رمزگشایی در حافظه (بدون فایل موقت)
+        data = np.fromfile(image_path, dtype=np.uint8)
+        img = cv2.imdecode(data, flags)
+        if img is not None:
+            return img
+
+        # روش ۳: استفاده از PIL و تبدیل به OpenCV
         try:
             with Image.open(image_path) as pil_img:
-                img_array = np.array(pil_img)
-                if len(img_array.shape) == 3:
-                    return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                else:
-                    return cv2.cvtColor(img_array, cv2.COLOR_GRAY2BGR)
+                if gray:
+                    return np.array(pil_img.convert('L'))
+                img_array = np.array(pil_img.convert('RGB'))
+                return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
         except:
             pass
 
-        # روش ۳: کپی به مسیر موقت
-        temp_dir = tempfile.gettempdir()
-        temp_filename = f"temp_{os.getpid()}.jpg"
-        temp_path = os.path.join(temp_dir, temp_filename)
+        return None
 
-        shutil.copy2(image_path, temp_path)
-        img = cv2.imread(temp_path)
+    except Exception as e:
+        print(f"خطا در خواندن تصویر: {e}")
+        return None
+
+
+def load_image(image):
+    """پذیرش مسیر فایل یا آرایه‌ی رمزگشایی‌شده و برگرداندن آرایه"""
+    if isinstance(image, np.ndarray):
+        return image
+    return safe_image_read(image)
 
-        try:
-            os.remove(temp_path)
-        except:
-            pass
 
+def to_gray(img):
+    """تبدیل تصویر رنگی به خاکستری (تصویر خاکستری بدون تغییر برمی‌گردد)"""
+    if img.ndim == 2:
         return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    except Exception as e:
-        print(f"خطا در خواندن تصویر: {e}")
+
+def embedded_image_zoom(page):
+    """وضوح بزرگ‌ترین تصویر درون صفحه نسبت به ۷۲ dpi (در صورت نبود تصویر None)"""
+    best_area, best_zoom = 0, None
+    for image in page.get_images(full=True):
+        xref, width = image[0], image[2]
+        for rect in page.get_image_rects(xref):
+            if rect.is_empty or rect.width <= 0:
+                continue
+            area = rect.width * rect.height
+            if area > best_area:
+                best_area, best_zoom = area, width / rect.width
+    return best_zoom
+
+
+def choose_render_zoom(page, target_text_height=PDF_TARGET_TEXT_HEIGHT, max_pixels=PDF_MAX_PIXELS,
+                       use_image_resolution=True):
+    """ضریب بزرگ‌نمایی رندر صفحه براساس اندازه‌ی صفحه، وضوح تصویر درون آن و سقف پیکسل
+
+    اندازه‌ی متن بدنه برای صفحه‌های بزرگ‌تر از A4 (مثل پوستر) به نسبت ابعاد صفحه بزرگ‌تر
+    فرض می‌شود تا صفحه‌های بزرگ بی‌دلیل با وضوح بالا رندر نشوند.
+    """
+    rect = page.rect
+    area = max(rect.width * rect.height, 1.0)
+
+    text_points = PDF_BODY_TEXT_POINTS * max(1.0, (area / A4_AREA_POINTS) ** 0.5)
+    zoom = target_text_height / text_points
+
+    # رندر با وضوحی بالاتر از تصویر اسکن‌شده اطلاعات تازه‌ای نمی‌سازد
+    if use_image_resolution:
+        native_zoom = embedded_image_zoom(page)
+        if native_zoom:
+            zoom = min(zoom, max(native_zoom, 1.0))
+
+    # سقف پیکسل برای محدود ماندن حافظه و زمان هر صفحه
+    zoom = min(zoom, (max_pixels / area) ** 0.5)
+    return max(zoom, 0.1)
+
+
+def pixmap_to_bgr(pix):
+    """تبدیل Pixmap به آرایه‌ی BGR بدون رمزگذاری میانی"""
+    if pix.colorspace is not None and pix.colorspace.n not in (1, 3):
+        # مثلاً CMYK
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+    img = img.reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if pix.n == 2:
+        return cv2.cvtColor(img[:, :, 0], cv2.COLOR_GRAY2BGR)
+    if pix.n == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+# چرخش صفحه (درجه) به تعداد چرخش ۹۰ درجه‌ای np.rot90
+PAGE_ROTATIONS = {0: 0, 90: -1, 180: 2, 270: 1}
+
+
+def extract_page_scan(page, zoom, min_coverage=0.9):
+    """برداشت مستقیم تصویر اسکن‌شده‌ی صفحه با وضوح اصلی (بدون رندر کل صفحه)
+
+    فقط برای صفحه‌هایی که یک تصویر بدون ماسک، بدون چرخش و تقریباً به اندازه‌ی کل صفحه دارند؛
+    در غیر این صورت None برمی‌گردد تا صفحه رندر شود. اگر وضوح تصویر بیش از zoom لازم
+    باشد، تصویر کوچک می‌شود.
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1:
         return None
 
+    xref, smask = images[0][0], images[0][1]
+    if smask or page.rotation not in PAGE_ROTATIONS:
+        return None
 
-def extract_text_from_pdf(pdf_path,reader):
-    """استخراج متن از PDF"""
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+
+    # فقط قرارگیری مستقیم (بدون چرخش، وارونگی یا برش)
+    if abs(matrix.b) > 1e-6 or abs(matrix.c) > 1e-6 or matrix.a <= 0 or matrix.d <= 0:
+        return None
+    page_rect = page.cropbox
+    visible = rect & page_rect
+    area = rect.width * rect.height
+    if visible.is_empty or visible.width * visible.height < area * 0.99:
+        return None
+    if area < page_rect.width * page_rect.height * min_coverage:
+        return None
+
+    img = pixmap_to_bgr(fitz.Pixmap(page.parent, xref))
+
+    scale = zoom / (img.shape[1] / rect.width)
+    if scale < 0.9:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    if PAGE_ROTATIONS[page.rotation]:
+        img = np.ascontiguousarray(np.rot90(img, PAGE_ROTATIONS[page.rotation]))
+    return img
+
+
+def render_pdf_page(page, render_options=None):
+    """تصویر صفحه‌ی PDF به صورت آرایه‌ی BGR (بدون PNG و فایل موقت)
+
+    render_options آرگومان‌های choose_render_zoom به‌علاوه‌ی use_embedded_images است؛
+    در صورت امکان تصویر اسکن‌شده‌ی درون صفحه مستقیماً برداشته می‌شود.
+    """
+    options = dict(render_options or {})
+    use_embedded_images = options.pop('use_embedded_images', True)
+    zoom = choose_render_zoom(page, **options)
+
+    if use_embedded_images:
+        try:
+            img = extract_page_scan(page, zoom)
+            if img is not None:
+                return img
+        except Exception as e:
+            print(f"⚠️ برداشت مستقیم تصویر صفحه ممکن نشد، صفحه رندر می‌شود: {e}")
 
-        for page_num in range(len(doc)):
+    return pixmap_to_bgr(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)))
+
+
+def ocr_images_batched(reader, images, batch_size=PDF_OCR_BATCH_SIZE):
+    """OCR گروهی تصاویر؛ برای هر تصویر، خروجی readtext آن را برمی‌گرداند"""
+    results = [None] * len(images)
+
+    # readtext_batched فقط تصاویر هم‌اندازه را با هم می‌پذیرد
+    groups = {}
+    for index, img in enumerate(images):
+        groups.setdefault(img.shape, []).append(index)
+
+    for indexes in groups.values():
+        if len(indexes) > 1 and hasattr(reader, 'readtext_batched'):
+            batch_results = reader.readtext_batched(
+                [images[i] for i in indexes],
+                detail=1,
+                batch_size=batch_size
+            )
+            for i, page_results in zip(indexes, batch_results):
+                results[i] = page_results
+        else:
+            for i in indexes:
+                results[i] = reader.readtext(images[i], detail=1)
+
+    return results
+
+
+def summarize_ocr_results(results, min_confidence=PDF_MIN_CONFIDENCE):
+    """تبدیل خروجی readtext صفحه به (متن، میانگین اطمینان)"""
+    texts = []
+    confidences = []
+    for (bbox, text_ocr, confidence) in results:
+        if confidence > min_confidence and len(text_ocr.strip()) > 0:
+            texts.append(text_ocr)
+            confidences.append(confidence)
+    if not texts:
+        return "متنی یافت نشد", 0.0
+    return ' '.join(texts), float(np.mean(confidences))
+
+
+def page_result(page_number, text, confidence, source):
+    """نتیجه‌ی یک صفحه؛ source یکی از 'text' (لایه‌ی متنی) یا 'ocr'"""
+    return {'page': page_number, 'text': text, 'confidence': confidence, 'source': source}
+
+
+def is_blank_page(img, reader=None, mode=BLANK_PAGE_CHECK):
+    """آیا صفحه سفید یا بدون متن است؟ (محاسبه‌ی برداری روی نسخه‌ی کوچک‌شده‌ی خاکستری)
+
+    حاشیه‌ی BLANK_MARGIN و لکه‌های کوچک‌تر از BLANK_MIN_SPECK پیکسل جوهر حساب نمی‌شوند. بدون
+    مدل تشخیص فقط صفحه‌ی بدون جوهر رد می‌شود؛ در حالت 'detect' هر صفحه‌ی جوهردار به مدل داده می‌شود.
+    """
+    if not mode:
+        return False
+
+    gray = to_gray(img)
+    scale = BLANK_CHECK_SIZE / max(gray.shape[:2])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    height, width = gray.shape[:2]
+    margin_y, margin_x = int(height * BLANK_MARGIN), int(width * BLANK_MARGIN)
+    body = gray[margin_y:height - margin_y, margin_x:width - margin_x]
+
+    # جوهر: انحراف مطلق از پس‌زمینه (متن روشن روی زمینه‌ی تیره هم حساب می‌شود) با آستانه‌ای
+    # که با نویز کاغذ (MAD) بزرگ می‌شود. انحراف معیار کل صفحه معیار یکدستی نیست: یک خط کوتاه
+    # یا دستنویس مدادی آن را تقریباً تغییر نمی‌دهد
+    deviation = np.abs(body.astype(np.int16) - int(np.median(body)))
+    noise = 1.4826 * float(np.median(deviation))
+    mask = (deviation > max(BLANK_INK_DELTA, BLANK_NOISE_FACTOR * noise)).astype(np.uint8)
+    if not mask.any():
+        return True
+
+    # گرد و غبار و نقطه‌های پراکنده‌ی اسکنر؛ یک حرف (حتی در قلم ریز) از این بزرگ‌تر است
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if not np.any(stats[1:, cv2.CC_STAT_AREA] >= BLANK_MIN_SPECK):
+        return True
+
+    # صفحه‌ای که جوهر دارد فقط با تأیید مدل تشخیص متن رد می‌شود (مثلاً یک خط کوتاه یا
+    # دستنویس کم‌رنگ نباید بی‌صدا از دست برود)
+    if mode == 'detect' and reader is not None and hasattr(reader, 'has_text'):
+        return reader.has_text(gray) is False
+    return False
+
+
+def skipped_page_result(page_number):
+    """نتیجه‌ی صفحه‌ای که به دلیل سفید بودن به OCR داده نشد"""
+    result = page_result(page_number, "متنی یافت نشد", 0.0, 'ocr')
+    result['skipped'] = True
+    return result
+
+
+def _ocr_page_buffer(reader, buffer, batch_size, blank_check=None):
+    """OCR صفحه‌های در انتظار بافر و برگرداندن همه‌ی صفحه‌های بافر به ترتیب
+
+    صفحه‌های سفید (نگاه کنید به is_blank_page) بدون OCR نتیجه‌ی skipped می‌گیرند و زمان
+    OCR هر صفحه در 'elapsed' ثبت می‌شود.
+    """
+    buffer = [
+        (page_number, skipped_page_result(page_number), None)
+        if result is None and is_blank_page(image, reader, blank_check) else (page_number, result, image)
+        for page_number, result, image in buffer
+    ]
+    images = [image for _, result, image in buffer if result is None]
+
+    started = time.perf_counter()
+    ocr_results = iter(ocr_images_batched(reader, images, batch_size))
+    elapsed = (time.perf_counter() - started) / len(images) if images else 0.0
+
+    pages = []
+    for page_number, result, _ in buffer:
+        if result is None:
+            text, confidence = summarize_ocr_results(next(ocr_results))
+            result = page_result(page_number, text, confidence, 'ocr')
+            result['elapsed'] = elapsed
+        pages.append(result)
+    return pages
+
+
+def iter_pdf_pages(pdf_path, reader, batch_size=PDF_OCR_BATCH_SIZE, pages=None, render_options=None,
+                   blank_check=None):
+    """نتیجه‌ی صفحه‌های PDF را به ترتیب و به محض آماده شدن برمی‌گرداند (generator)
+
+    صفحه‌های اسکن‌شده در حافظه رندر می‌شوند و در دسته‌های batch_size تایی
+    به OCR داده می‌شوند؛ batch_size=1 همان پردازش صفحه به صفحه است.
+    pages (شماره‌های از صفر) در صورت تعیین، فقط همان صفحه‌ها را پردازش می‌کند.
+    وضوح رندر هر صفحه با render_options تعیین می‌شود (نگاه کنید به choose_render_zoom)
+    و با blank_check صفحه‌های سفید بدون OCR رد می‌شوند (نگاه کنید به is_blank_page).
+    """
+    # صفحه‌های متنی بعد از یک صفحه‌ی اسکن‌شده تا OCR آن در بافر می‌مانند تا ترتیب حفظ شود
+    buffer = []
+    waiting = 0
+
+    with fitz.open(pdf_path) as doc:
+        for page_num in (range(len(doc)) if pages is None else pages):
             page = doc.load_page(page_num)
             page_text = page.get_text()
 
             if page_text.strip():
-                text += f"\n--- صفحه {page_num + 1} ---\n{page_text}"
+                result = page_result(page_num + 1, page_text, 1.0, 'text')
+                if buffer:
+                    buffer.append((page_num + 1, result, None))
+                else:
+                    yield result
             else:
-                # اگر متن مستقیم وجود نداشت، از OCR استفاده کن
-                pix = page.get_pixmap()
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-                img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+                # اگر متن مستقیم وجود نداشت، صفحه برای OCR گروهی کنار گذاشته می‌شود
+                buffer.append((page_num + 1, None, render_pdf_page(page, render_options)))
+                waiting += 1
+                if waiting >= batch_size:
+                    yield from _ocr_page_buffer(reader, buffer, batch_size, blank_check)
+                    buffer = []
+                    waiting = 0
 
-                # ذخیره موقت و پردازش با OCR
-                temp_path = f"temp_page_{page_num}.png"
-                cv2.imwrite(temp_path, img_cv)
+        if buffer:
+            yield from _ocr_page_buffer(reader, buffer, batch_size, blank_check)
 
-                # استفاده از OCR ساده
-                results = reader.readtext(temp_path, detail=1)
-                texts = []
-                for (bbox, text_ocr, confidence) in results:
-                    if confidence > 0.2 and len(text_ocr.strip()) > 0:
-                        texts.append(text_ocr)
 
-                ocr_result = ' '.join(texts) if texts else "متنی یافت نشد"
-                text += f"\n--- صفحه {page_num + 1} (OCR) ---\n{ocr_result}"
+def missing_pdf_pages(pdf_path, completed_pages=None):
+    """شماره‌های (از صفر) صفحه‌هایی که هنوز نتیجه‌ای برایشان ثبت نشده است"""
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    completed_pages = completed_pages or {}
+    return [page_num for page_num in range(page_count) if page_num + 1 not in completed_pages]
 
-                # حذف فایل موقت
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-
-        doc.close()
-        return text.strip()
 
+def extract_text_from_pdf(pdf_path, reader, batch_size=PDF_OCR_BATCH_SIZE, render_options=None):
+    """استخراج متن از PDF"""
+    try:
+        pages = {page['page']: page for page in iter_pdf_pages(pdf_path, reader, batch_size,
+                                                                render_options=render_options)}
+        return join_pdf_pages(pages)
     except Exception as e:
         return f"خطا در پردازش PDF: {str(e)}"
 
 
+def image_frame_count(image_path):
+    """تعداد فریم‌های تصویر (مثلاً TIFF چندصفحه‌ای)؛ در صورت خطا ۱"""
+    try:
+        with Image.open(image_path) as img:
+            return getattr(img, 'n_frames', 1)
+    except Exception:
+        return 1
+
+
+def iter_image_frames(image_path, frames=None):
+    """فریم‌های تصویر چندفریمی یکی‌یکی به صورت خاکستری (generator)
+
+    با seek فقط همان فریم رمزگشایی می‌شود؛ frames (شماره‌های از صفر) در صورت تعیین،
+    فقط همان فریم‌ها را برمی‌گرداند.
+    """
+    with Image.open(image_path) as img:
+        for index in (range(getattr(img, 'n_frames', 1)) if frames is None else frames):
+            img.seek(index)
+            yield index + 1, np.array(img.convert('L'))
+
+
+def iter_image_pages(image_path, reader, batch_size=PDF_OCR_BATCH_SIZE, frames=None, blank_check=None):
+    """نتیجه‌ی فریم‌های تصویر چندصفحه‌ای به ترتیب، با OCR دسته‌های batch_size تایی (generator)"""
+    buffer = []
+    for page_number, frame in iter_image_frames(image_path, frames):
+        buffer.append((page_number, None, frame))
+        if len(buffer) >= batch_size:
+            yield from _ocr_page_buffer(reader, buffer, batch_size, blank_check)
+            buffer = []
+
+    if buffer:
+        yield from _ocr_page_buffer(reader, buffer, batch_size, blank_check)
+
+
+# Reader اختصاصی هر پردازه‌ی استخر PDF (یک بار در شروع پردازه ساخته می‌شود)
+_pool_reader = None
+# سقف حافظه‌ی مقیم (RSS، مگابایت) پردازه‌ی استخر و RSS آن پس از ساخت موتور
+_pool_max_rss_mb = None
+_pool_base_rss_mb = None
+
+
+class PoolMemoryLimitError(Exception):
+    """سقف حافظه‌ی پردازه‌های استخر PDF از حافظه‌ی خود موتور کمتر است"""
+
+
+def _rss_mb():
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _init_pdf_pool_process(backend_name, backend_options, languages, max_memory_mb, torch_threads):
+    """آماده‌سازی پردازه‌ی استخر: سقف حافظه، تعداد نخ‌های torch و موتور گرم"""
+    global _pool_reader, _pool_max_rss_mb, _pool_base_rss_mb
+    # سقف روی RSS اعمال می‌شود نه فضای آدرس مجازی (RLIMIT_AS)؛ torch و OpenMP فضای مجازی
+    # بسیار بیشتری از مصرف واقعی رزرو می‌کنند و RLIMIT_AS ساخت موتور را ناموفق می‌کرد
+    _pool_max_rss_mb = max_memory_mb if psutil is not None else None
+    if torch_threads:
+        # موتورهای بدون torch (مثلاً tesseract) بدون نصب آن هم در استخر اجرا می‌شوند
+        try:
+            import torch
+        except ImportError:
+            torch = None
+        if torch is not None:
+            torch.set_num_threads(int(torch_threads))
+    _pool_reader = create_backend(backend_name, languages, **backend_options)
+    if _pool_max_rss_mb:
+        _pool_base_rss_mb = _rss_mb()
+
+
+def _pool_memory_exceeded():
+    """RSS پردازه‌ی استخر اگر پس از جمع‌آوری زباله هنوز از سقف بیشتر باشد، وگرنه None"""
+    if not _pool_max_rss_mb or _rss_mb() <= _pool_max_rss_mb:
+        return None
+    gc.collect()
+    rss_mb = _rss_mb()
+    return rss_mb if rss_mb > _pool_max_rss_mb else None
+
+
+def _pdf_pool_task(pdf_path, pages, batch_size, render_options, blank_check):
+    """پردازش یک بازه از صفحه‌ها در پردازه‌ی استخر: (نتیجه‌ی صفحه‌ها، RSS در صورت عبور از سقف)
+
+    حافظه پس از هر صفحه بررسی می‌شود؛ با عبور از سقف، پردازش بازه متوقف و صفحه‌های انجام‌شده
+    برگردانده می‌شوند تا پردازه‌ی اصلی استخر را با پردازه‌های تازه جایگزین کند و بقیه‌ی بازه
+    را دوباره بفرستد (نگاه کنید به UniversalOCR._iter_pdf_pages_parallel).
+    """
+    if _pool_max_rss_mb and _pool_base_rss_mb > _pool_max_rss_mb:
+        raise PoolMemoryLimitError(
+            f"حافظه‌ی پردازه پس از بارگذاری موتور ({_pool_base_rss_mb:.0f} MB) از سقف "
+            f"pdf_worker_max_memory_mb ({_pool_max_rss_mb} MB) بیشتر است"
+        )
+    results = []
+    for page in iter_pdf_pages(pdf_path, _pool_reader, batch_size, pages, render_options, blank_check):
+        results.append(page)
+        rss_mb = _pool_memory_exceeded()
+        if rss_mb is not None:
+            return results, rss_mb
+    return results, None
+
+
+def split_pages(pages, workers, batch_size):
+    """تقسیم صفحه‌ها به بازه‌های پیوسته برای توزیع بین پردازه‌ها"""
+    # چند بازه برای هر پردازه تا پردازه‌های سریع‌تر بیکار نمانند
+    chunk = max(batch_size, -(-len(pages) // (workers * 4)))
+    return [pages[start:start + chunk] for start in range(0, len(pages), chunk)]
+
+
 def extract_text_from_word(word_path):
-    """استخراج متن از فایل Word"""
+    """استخراج متن از فایل Word (پاراگراف‌ها و جدول‌ها به ترتیب سند، همراه سربرگ و پانویس)"""
     try:
-        doc = Document(word_path)
-        full_text = []
-
-        # استخراج متن از پاراگراف‌ها
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                full_text.append(paragraph.text)
-
-        # استخراج متن از جداول
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    if cell.text.strip():
-                        full_text.append(cell.text)
-
-        text = '\n'.join(full_text)
+        text = '\n'.join(iter_docx_text(word_path))
         return text.strip() if text.strip() else "📝 متنی در فایل Word یافت نشد"
 
     except Exception as e:
         return f"خطا در پردازش فایل Word: {str(e)}"
 
 
-def extract_text_from_text_file(file_path):
-    """استخراج متن از فایل متنی"""
+def extract_text_from_text_file(file_path, max_bytes=TEXT_MAX_BYTES):
+    """استخراج متن از فایل متنی (خواندن تکه‌تکه، حداکثر max_bytes بایت)"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='windows-1256') as f:
-                return f.read()
-        except:
-            return "خطا در خواندن فایل متنی"
+        text, truncated = read_text_file(file_path, max_bytes)
+        if truncated:
+            print(f"⚠️ فایل متنی بزرگ‌تر از {max_bytes} بایت است و کوتاه شد")
+            text += "\n... (ادامه‌ی فایل به دلیل حجم زیاد خوانده نشد)"
+        return text
+    except Exception:
+        return "خطا در خواندن فایل متنی"
+
+
+def estimate_text_height(gray):
+    """تخمین ارتفاع میانه‌ی اجزای متن (پیکسل) در تصویر خاکستری؛ اگر متن کافی نبود None"""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+
+    # حذف نقطه‌های نویز و اجزای خیلی بزرگ (خطوط جدول، حاشیه‌ها، تصاویر)
+    keep = (heights >= 2) & (heights < gray.shape[0] / 10) & (widths < gray.shape[1] / 10)
+    if keep.sum() < TEXT_HEIGHT_MIN_COMPONENTS:
+        return None
+    return float(np.median(heights[keep]))
+
+
+def jpeg_reduce_factor(image_path, target_text_height=IMAGE_TARGET_TEXT_HEIGHT,
+                       min_pixels=IMAGE_REDUCE_MIN_PIXELS):
+    """ضریب کاهش وضوح رمزگشایی JPEG (۱، ۲، ۴ یا ۸)
+
+    ارتفاع متن روی نسخه‌ی ۱/۸ تصویر تخمین زده می‌شود که PIL در حالت draft مستقیماً
+    از ضرایب DCT و بدون رمزگشایی کامل می‌سازد.
+    """
+    try:
+        with Image.open(image_path) as img:
+            if img.format != 'JPEG' or img.width * img.height <= min_pixels:
+                return 1
+            full_width = img.width
+            img.draft('L', (img.width // 8, img.height // 8))
+            thumbnail = np.array(img.convert('L'))
+    except Exception:
+        return 1
+
+    text_height = estimate_text_height(thumbnail)
+    if text_height is None:
+        return 1
+    text_height *= full_width / thumbnail.shape[1]
 
+    factor = 1
+    while factor < 8 and text_height / (factor * 2) >= target_text_height:
+        factor *= 2
+    return factor
 
-def detect_text_type(image_path):
-    """تشخیص نوع متن (تایپی یا دستنویس)"""
+
+def image_pixels(image_path):
+    """تعداد پیکسل‌های تصویر از سرآیند فایل، بدون رمزگشایی (در صورت خطا None)"""
     try:
-        img = safe_image_read(image_path)
+        with Image.open(image_path) as img:
+            return img.width * img.height
+    except Exception:
+        return None
+
+
+def read_image_for_ocr(image_path, target_text_height=IMAGE_TARGET_TEXT_HEIGHT,
+                       min_pixels=IMAGE_REDUCE_MIN_PIXELS, gray_above_pixels=None):
+    """خواندن تصویر با کمترین وضوحی که OCR لازم دارد (JPEGهای بزرگ) یا با وضوح کامل
+
+    تصویری که پس از کاهش وضوح هنوز بیش از gray_above_pixels پیکسل دارد (مسیر کاشی‌به‌کاشی)
+    مستقیماً خاکستری رمزگشایی می‌شود تا اوج حافظه نسخه‌ی رنگی کامل را شامل نشود.
+    """
+    factor = jpeg_reduce_factor(image_path, target_text_height, min_pixels) if target_text_height else 1
+    pixels = image_pixels(image_path) if gray_above_pixels else None
+    gray = pixels is not None and pixels / (factor * factor) > gray_above_pixels
+    if factor > 1:
+        # رمزگشایی کاهش‌یافته در حوزه‌ی DCT؛ زمان رمزگشایی و پیش‌پردازش به همان نسبت کم می‌شود
+        flags = (JPEG_REDUCED_GRAY_FLAGS if gray else JPEG_REDUCED_FLAGS)[factor]
+        img = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), flags)
+        if img is not None:
+            print(f"رمزگشایی JPEG با وضوح 1/{factor}: {img.shape[1]}x{img.shape[0]}")
+            return img
+    return safe_image_read(image_path, gray)
+
+
+def detect_text_type(image):
+    """تشخیص نوع متن (تایپی یا دستنویس) از مسیر فایل یا آرایه‌ی تصویر"""
+    try:
+        img = load_image(image)
         if img is None:
             return "unknown"
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = to_gray(img)
         laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
 
         print(f"واریانس لاپلاسین: {laplacian_var}")
@@ -184,14 +687,14 @@ def detect_text_type(image_path):
         return "unknown"
 
 
-def simple_preprocess(image_path):
-    """پیش‌پردازش ساده و مؤثر"""
+def simple_preprocess(image):
+    """پیش‌پردازش ساده و مؤثر روی مسیر فایل یا آرایه‌ی تصویر"""
     try:
-        img = safe_image_read(image_path)
+        img = load_image(image)
         if img is None:
             return None
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = to_gray(img)
 
         # افزایش کنتراست ساده
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -207,37 +710,517 @@ def simple_preprocess(image_path):
         return None
 
 
+def center_crop(img, size):
+    """برش مرکزی تصویر با حداکثر ابعاد size"""
+    height, width = img.shape[:2]
+    top = max(0, (height - size) // 2)
+    left = max(0, (width - size) // 2)
+    return img[top:top + size, left:left + size]
+
+
+def tile_origins(length, tile_size, overlap):
+    """نقاط شروع کاشی‌ها در یک بعد؛ کاشی آخر به لبه‌ی تصویر چسبیده است"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, tile_size - overlap)
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+
+def box_rect(bbox):
+    """مستطیل محیطی کادر چهارنقطه‌ای: (چپ، بالا، راست، پایین)"""
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def sort_reading_order(results):
+    """مرتب‌سازی کادرها خط‌به‌خط از بالا به پایین و در هر خط از چپ به راست (مانند EasyOCR)"""
+    if not results:
+        return []
+    rects = [box_rect(bbox) for bbox, _, _ in results]
+    line_height = float(np.median([bottom - top for _, top, _, bottom in rects])) or 1.0
+
+    lines = []
+    for index in sorted(range(len(results)), key=lambda i: (rects[i][1] + rects[i][3]) / 2):
+        center = (rects[index][1] + rects[index][3]) / 2
+        if lines and abs(center - lines[-1][0]) < line_height / 2:
+            lines[-1][1].append(index)
+        else:
+            lines.append([center, [index]])
+
+    return [results[i] for _, indexes in lines for i in sorted(indexes, key=lambda i: rects[i][0])]
+
+
+def merge_tile_results(results, duplicate_ratio=0.5):
+    """حذف کادرهای تکراری نواحی هم‌پوشان کاشی‌ها (با حفظ کادر مطمئن‌تر) و چیدن به ترتیب خواندن"""
+    kept = []
+    kept_rects = np.empty((0, 4), dtype=np.float64)
+    for item in sorted(results, key=lambda r: -r[2]):
+        rect = np.array(box_rect(item[0]), dtype=np.float64)
+        if len(kept):
+            width = np.clip(np.minimum(kept_rects[:, 2], rect[2]) - np.maximum(kept_rects[:, 0], rect[0]), 0, None)
+            height = np.clip(np.minimum(kept_rects[:, 3], rect[3]) - np.maximum(kept_rects[:, 1], rect[1]), 0, None)
+            areas = (kept_rects[:, 2] - kept_rects[:, 0]) * (kept_rects[:, 3] - kept_rects[:, 1])
+            smaller = np.maximum(np.minimum(areas, (rect[2] - rect[0]) * (rect[3] - rect[1])), 1.0)
+            if np.any(width * height / smaller > duplicate_ratio):
+                continue
+        kept.append(item)
+        kept_rects = np.vstack([kept_rects, rect])
+    return sort_reading_order(kept)
+
+
+def ocr_image_tiled(reader, img, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, workers=1, **readtext_options):
+    """OCR تصویر بزرگ به صورت کاشی‌های هم‌پوشان
+
+    هر کاشی جداگانه پیش‌پردازش و OCR می‌شود، پس حافظه‌ی مدل و پیش‌پردازش متناسب با
+    اندازه‌ی کاشی است. کادرهایی که لبه‌ی داخلی کاشی آن‌ها را بریده است کنار گذاشته می‌شوند
+    (کاشی همسایه آن‌ها را کامل می‌بیند) و کادرهای تکراری ناحیه‌ی هم‌پوشانی ادغام می‌شوند.
+    با workers > 1 کاشی‌ها همزمان در چند نخ پردازش می‌شوند.
+    """
+    height, width = img.shape[:2]
+    origins = [(x, y) for y in tile_origins(height, tile_size, overlap)
+               for x in tile_origins(width, tile_size, overlap)]
+    margin = 2
+
+    def run(origin):
+        x0, y0 = origin
+        tile = img[y0:y0 + tile_size, x0:x0 + tile_size]
+        processed = simple_preprocess(tile)
+        results = reader.readtext(processed if processed is not None else tile, detail=1, **readtext_options)
+
+        tile_height, tile_width = tile.shape[:2]
+        output = []
+        for bbox, text, confidence in results:
+            left, top, right, bottom = box_rect(bbox)
+            cut = (
+                (x0 > 0 and left <= margin and right - left < overlap) or
+                (x0 + tile_width < width and right >= tile_width - margin and right - left < overlap) or
+                (y0 > 0 and top <= margin and bottom - top < overlap) or
+                (y0 + tile_height < height and bottom >= tile_height - margin and bottom - top < overlap)
+            )
+            if not cut:
+                output.append(([[int(x) + x0, int(y) + y0] for x, y in bbox], text, confidence))
+        return output
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            tile_results = list(pool.map(run, origins))
+    else:
+        tile_results = [run(origin) for origin in origins]
+
+    return merge_tile_results([item for results in tile_results for item in results])
+
+
+def ocr_image_coarse_to_fine(reader, img, scale=COARSE_SCALE, refine_confidence=COARSE_REFINE_CONFIDENCE,
+                             **readtext_options):
+    """OCR دومرحله‌ای: کل تصویر با وضوح کم، سپس فقط نواحی کم‌اطمینان با وضوح کامل
+
+    مرحله‌ی دوم فقط بازشناسی (بدون تشخیص) روی همان کادرها است و برای هر ناحیه نتیجه‌ی
+    مطمئن‌تر از دو مرحله نگه داشته می‌شود. کادرهای خروجی در مختصات تصویر کامل هستند.
+    """
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    coarse = reader.readtext(small, detail=1, **readtext_options)
+
+    height, width = img.shape[:2]
+    results = []
+    refined = 0
+    for bbox, text, confidence in coarse:
+        bbox = [[int(x / scale), int(y / scale)] for x, y in bbox]
+        if confidence < refine_confidence:
+            left, top, right, bottom = box_rect(bbox)
+            box = (
+                max(0, left - COARSE_BOX_PADDING), min(width, right + COARSE_BOX_PADDING),
+                max(0, top - COARSE_BOX_PADDING), min(height, bottom + COARSE_BOX_PADDING),
+            )
+            fine_text, fine_confidence = reader.recognize(img, box)
+            refined += 1
+            if fine_text.strip() and fine_confidence > confidence:
+                text, confidence = fine_text, fine_confidence
+        results.append((bbox, text, confidence))
+
+    print(f"OCR دومرحله‌ای: {len(coarse)} ناحیه، {refined} ناحیه با وضوح کامل بازخوانی شد")
+    return results
+
+
 class UniversalOCR:
-    def __init__(self):
+    def __init__(self, pdf_batch_size=PDF_OCR_BATCH_SIZE, pdf_workers=1, pdf_worker_max_memory_mb=None,
+                 pdf_worker_torch_threads=1, pdf_parallel_min_pages=PDF_PARALLEL_MIN_PAGES,
+                 backend='easyocr', backend_options=None, backend_routing=None,
+                 pdf_target_text_height=PDF_TARGET_TEXT_HEIGHT, pdf_max_pixels=PDF_MAX_PIXELS,
+                 pdf_use_image_resolution=True, pdf_use_embedded_images=True, tile_max_pixels=TILE_MAX_PIXELS, tile_size=TILE_SIZE,
+                 tile_overlap=TILE_OVERLAP, tile_workers=1, text_max_bytes=TEXT_MAX_BYTES,
+                 image_target_text_height=IMAGE_TARGET_TEXT_HEIGHT, image_reduce_min_pixels=IMAGE_REDUCE_MIN_PIXELS,
+                 blank_page_check=BLANK_PAGE_CHECK, coarse_scale=None,
+                 coarse_refine_confidence=COARSE_REFINE_CONFIDENCE, languages=None, reader_pool_memory_mb=None,
+                 reader_pool_size=None, reader_preload=None):
+        self.pdf_batch_size = max(1, int(pdf_batch_size))
+        # پردازش موازی PDF: تعداد پردازه‌ها، سقف حافظه و نخ‌های torch هر پردازه
+        self.pdf_workers = max(1, int(pdf_workers))
+        self.pdf_worker_max_memory_mb = pdf_worker_max_memory_mb
+        self.pdf_worker_torch_threads = pdf_worker_torch_threads
+        self.pdf_parallel_min_pages = pdf_parallel_min_pages
+        self._pdf_pools = {}
+        # وضوح رندر صفحه‌های اسکن‌شده (نگاه کنید به choose_render_zoom)
+        self.pdf_render_options = {
+            'target_text_height': pdf_target_text_height,
+            'max_pixels': pdf_max_pixels,
+            'use_image_resolution': pdf_use_image_resolution,
+            'use_embedded_images': pdf_use_embedded_images,
+        }
+
+        # پردازش کاشی‌به‌کاشی تصاویر بزرگ (نگاه کنید به ocr_image_tiled)
+        self.tile_max_pixels = tile_max_pixels
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_workers = max(1, int(tile_workers))
+
+        # رمزگشایی JPEGهای بزرگ با وضوح کمتر (None = همیشه وضوح کامل؛ نگاه کنید به read_image_for_ocr)
+        self.image_target_text_height = image_target_text_height
+        self.image_reduce_min_pixels = image_reduce_min_pixels
+
+        # حالت دومرحله‌ای برای تصاویر (None = غیرفعال؛ نگاه کنید به ocr_image_coarse_to_fine)
+        self.coarse_scale = coarse_scale
+        self.coarse_refine_confidence = coarse_refine_confidence
+
+        # رد کردن صفحه‌ها و تصاویر سفید پیش از OCR (نگاه کنید به is_blank_page)
+        self.blank_page_check = blank_page_check
+
+        # سقف حجم فایل‌های متنی (نگاه کنید به extract_text_from_text_file)
+        self.text_max_bytes = text_max_bytes
+
+        # موتور پیش‌فرض، تنظیمات هر موتور ({نام: {...}}) و مسیریابی براساس نوع سند
+        # (کلیدهای 'printed'، 'handwritten' و 'pdf')
+        self.backend_name = backend
+        self.backend_options = backend_options or {}
+        self.backend_routing = backend_routing or {}
+        self.languages = list(languages or DEFAULT_LANGUAGES)
+
+        # موتورهای گرم براساس (موتور، زبان‌ها، تنظیمات) با سقف حافظه و حذف LRU
+        # موتور پیش‌فرض فقط در استخر نگه داشته می‌شود تا مثل بقیه با حذف LRU آزاد شود
+        self.readers = ReaderPool(reader_pool_memory_mb, reader_pool_size)
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(current_dir, '..', 'easyocr_models')
-            self.reader = easyocr.Reader(
-                ['fa', 'en'],
-                gpu=False,
-                download_enabled=False,
-                model_storage_directory=model_path
-            )
+            self.get_backend(backend)
             self.ocr_available = True
-            print("✅ EasyOCR با موفقیت راه‌اندازی شد")
+            print(f"✅ موتور {backend} با موفقیت راه‌اندازی شد")
         except Exception as e:
-            print(f"❌ خطا در راه‌اندازی EasyOCR: {e}")
+            print(f"❌ خطا در راه‌اندازی موتور {backend}: {e}")
             self.ocr_available = False
 
-    def extract_text(self, file_path, text_type="auto"):
-        """استخراج متن از انواع فایل‌ها"""
+        if self.ocr_available:
+            self.readers.preload(reader_preload, backend, self.languages, self.backend_options)
+
+    def _reader_spec(self, document_type=None, backend=None, languages=None, reader_options=None):
+        """(نام موتور، زبان‌ها، تنظیمات) براساس درخواست، مسیریابی نوع سند و پیش‌فرض‌ها"""
+        name = backend or self.backend_routing.get(document_type) or self.backend_name
+        options = dict(self.backend_options.get(name, {}))
+        options.update(reader_options or {})
+        return name, list(languages or self.languages), options
+
+    def get_backend(self, name, languages=None, options=None):
+        """موتور گرم با نام name و زبان‌ها/تنظیمات داده‌شده (از استخر موتورها)"""
+        return self.readers.get(*self._reader_spec(backend=name, languages=languages, reader_options=options))
+
+    def _get_pdf_pool(self, spec):
+        """استخر پردازه‌های PDF هر پیکربندی موتور؛ بین فراخوانی‌ها باقی می‌ماند تا موتورها گرم بمانند"""
+        key = reader_key(*spec)
+        if key not in self._pdf_pools:
+            name, languages, options = spec
+            # spawn به‌جای fork تا نخ‌های torch پردازه‌ی والد به فرزندان به ارث نرسند
+            self._pdf_pools[key] = ProcessPoolExecutor(
+                max_workers=self.pdf_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_pdf_pool_process,
+                initargs=(name, options, languages, self.pdf_worker_max_memory_mb, self.pdf_worker_torch_threads)
+            )
+        return self._pdf_pools[key]
+
+    def close(self, spec=None):
+        """بستن استخر پردازه‌های PDF (همه یا فقط یک پیکربندی موتور)"""
+        for key in ([reader_key(*spec)] if spec else list(self._pdf_pools)):
+            pool = self._pdf_pools.pop(key, None)
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def after_fork(self):
+        """در پردازه‌ی فرزند fork (ocr_worker --concurrency): استخرهای PDF متعلق به والدند و رها می‌شوند"""
+        self._pdf_pools = {}
+
+    def _submit_pdf_chunk(self, spec, pdf_path, chunk):
+        pool = self._get_pdf_pool(spec)
+        return pool, pool.submit(_pdf_pool_task, pdf_path, chunk, self.pdf_batch_size, self.pdf_render_options,
+                                 self.blank_page_check)
+
+    def _iter_pdf_pages_serial(self, pdf_path, pages, spec):
+        return iter_pdf_pages(pdf_path, self.readers.get(*spec), self.pdf_batch_size, pages,
+                              self.pdf_render_options, self.blank_page_check)
+
+    def _iter_pdf_pages_parallel(self, pdf_path, pages, spec):
+        """توزیع بازه‌های صفحه بین پردازه‌ها و برگرداندن نتایج به ترتیب صفحه"""
+        chunks = split_pages(pages, self.pdf_workers, self.pdf_batch_size)
+        submitted = [self._submit_pdf_chunk(spec, pdf_path, chunk) for chunk in chunks]
+
+        index = 0
+        while index < len(chunks):
+            chunk = chunks[index]
+            pool, future = submitted[index]
+            try:
+                chunk_pages, overflow_mb = future.result()
+            except PoolMemoryLimitError as e:
+                # سقف از حافظه‌ی خود موتور کمتر است؛ هر بازه در پردازه‌ی استخر شکست می‌خورد و
+                # دوباره سریالی انجام می‌شد، پس پردازش موازی تا پایان عمر این نمونه خاموش می‌شود
+                print(f"⚠️ پردازش موازی PDF غیرفعال شد: {e}؛ pdf_worker_max_memory_mb را افزایش دهید")
+                self.pdf_workers = 1
+                self.close()
+                yield from self._iter_pdf_pages_serial(pdf_path, [page for rest in chunks[index:] for page in rest],
+                                                       spec)
+                return
+            except Exception as e:
+                print(f"⚠️ خطا در پردازش موازی صفحات {chunk[0] + 1} تا {chunk[-1] + 1}: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self.close(spec)
+                chunk_pages, overflow_mb = self._iter_pdf_pages_serial(pdf_path, chunk, spec), None
+
+            yield from chunk_pages
+            if overflow_mb is not None:
+                self._recycle_pdf_pool(spec, pool, overflow_mb)
+                # بقیه‌ی همین بازه و بازه‌هایی که با بستن استخر لغو شدند دوباره فرستاده می‌شوند
+                rest = chunk[len(chunk_pages):]
+                if rest:
+                    chunks.insert(index + 1, rest)
+                    submitted.insert(index + 1, self._submit_pdf_chunk(spec, pdf_path, rest))
+                for later in range(index + 1, len(chunks)):
+                    if submitted[later][1].cancelled():
+                        submitted[later] = self._submit_pdf_chunk(spec, pdf_path, chunks[later])
+            index += 1
+
+    def _recycle_pdf_pool(self, spec, pool, rss_mb):
+        """جایگزینی استخری که یکی از پردازه‌هایش از سقف حافظه عبور کرده است
+
+        حافظه‌ی پردازه فقط با پایان آن آزاد می‌شود؛ کارهای در حال اجرا تمام و بقیه لغو می‌شوند و
+        استخر بعدی با پردازه‌های تازه ساخته می‌شود. اگر استخر پیش‌تر جایگزین شده باشد کاری نمی‌شود.
+        """
+        key = reader_key(*spec)
+        if self._pdf_pools.get(key) is not pool:
+            return
+        print(f"♻️ حافظه‌ی پردازه‌ی PDF ({rss_mb:.0f} MB) از سقف {self.pdf_worker_max_memory_mb} MB "
+              f"بیشتر شد؛ پردازه‌ها دوباره راه‌اندازی می‌شوند")
+        del self._pdf_pools[key]
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_pdf_pages(self, file_path, completed_pages=None, backend=None, languages=None, reader_options=None):
+        """انتخاب مسیر سریالی یا موازی برای صفحه‌های باقی‌مانده‌ی PDF"""
+        spec = self._reader_spec('pdf', backend, languages, reader_options)
+        pages = missing_pdf_pages(file_path, completed_pages)
+
+        if self.pdf_workers > 1 and len(pages) >= self.pdf_parallel_min_pages:
+            yield from self._iter_pdf_pages_parallel(file_path, pages, spec)
+        else:
+            yield from iter_pdf_pages(file_path, self.readers.get(*spec), self.pdf_batch_size,
+                                      pages, self.pdf_render_options, self.blank_page_check)
+
+    def _iter_frame_pages(self, file_path, completed_pages=None, backend=None, languages=None, reader_options=None):
+        """فریم‌های باقی‌مانده‌ی تصویر چندصفحه‌ای؛ مانند صفحه‌های اسکن‌شده‌ی PDF پردازش می‌شوند"""
+        reader = self.readers.get(*self._reader_spec('pdf', backend, languages, reader_options))
+        completed_pages = completed_pages or {}
+        frames = [index for index in range(image_frame_count(file_path)) if index + 1 not in completed_pages]
+        yield from iter_image_pages(file_path, reader, self.pdf_batch_size, frames,
+                                    self.blank_page_check)
+
+    def _extract_pages(self, pages_iter, completed_pages, on_page, label):
+        """چسباندن صفحه‌های ثبت‌شده و صفحه‌های تازه با نشانگر شماره صفحه
+
+        صفحه‌های سفیدِ ردشده در skipped_pages گزارش می‌شوند و time_saved تخمین زمان صرفه‌جویی‌شده
+        (تعداد آن‌ها ضرب در میانگین زمان OCR صفحه‌های همین سند) است.
+        """
+        pages = dict(completed_pages or {})
+        error = None
+        try:
+            for page in pages_iter:
+                pages[page['page']] = page
+                if on_page is not None:
+                    on_page(page)
+            text = join_pdf_pages(pages)
+        except Exception as e:
+            # صفحه‌های ثبت‌شده با on_page باقی می‌مانند و اجرای بعدی از همان‌جا ادامه می‌دهد
+            error = str(e)
+            text = f"خطا در پردازش {label}: {error}"
+
+        skipped = sorted(number for number, page in pages.items() if page.get('skipped'))
+        elapsed = [page['elapsed'] for page in pages.values() if 'elapsed' in page]
+        time_saved = len(skipped) * float(np.mean(elapsed)) if skipped and elapsed else 0.0
+        if skipped:
+            print(f"⏭️ {len(skipped)} صفحه‌ی سفید بدون OCR رد شد (صرفه‌جویی تقریبی: {time_saved:.1f} ثانیه)")
+
+        # صفحه‌های ردشده در میانگین دقت حساب نمی‌شوند
+        confidences = [page['confidence'] for page in pages.values() if not page.get('skipped')]
+        result = {
+            'text': text if text.strip() else f"📝 متنی در {label} یافت نشد",
+            'confidence': float(np.mean(confidences)) if confidences else 0.0,
+            'pages': len(pages),
+            'skipped_pages': skipped,
+            'time_saved': round(time_saved, 2),
+        }
+        if error is not None:
+            result.update({'type': 'error', 'error': error})
+        return result
+
+    def iter_pages(self, file_path, text_type="auto", completed_pages=None, backend=None, languages=None,
+                   reader_options=None):
+        """نتیجه‌ی صفحه‌به‌صفحه به محض آماده شدن (generator)
+
+        هر صفحه دیکشنری {'page', 'text', 'confidence', 'source'} است و صفحه‌ها به ترتیب
+        برگردانده می‌شوند. برای PDF و تصویر چندصفحه‌ای (TIFF) فقط صفحه‌هایی که در completed_pages
+        نیستند پردازش می‌شوند؛ سایر فایل‌ها یک صفحه با کل نتیجه برمی‌گردانند.
+        """
+        file_type = detect_file_type(file_path)
+        if file_type == 'pdf':
+            yield from self._iter_pdf_pages(file_path, completed_pages, backend, languages, reader_options)
+            return
+        if file_type == 'image' and image_frame_count(file_path) > 1:
+            yield from self._iter_frame_pages(file_path, completed_pages, backend, languages, reader_options)
+            return
+
+        result = self.extract_text(file_path, text_type, backend=backend, languages=languages,
+                                   reader_options=reader_options)
+        source = 'ocr' if result.get('file_type') == 'image' else 'text'
+        yield page_result(1, result['text'], result.get('confidence', 0.0), source)
+
+    def config_signature(self, text_type="auto", backend=None, languages=None, reader_options=None):
+        """تنظیماتی از موتور که روی خروجی اثر دارند (برای کلید کش نتایج)"""
+        return {
+            'backend': backend or self.backend_name,
+            'backend_routing': self.backend_routing,
+            'backend_options': self.backend_options,
+            'reader_options': reader_options or {},
+            'languages': list(languages or self.languages),
+            'thresholds': TEXT_THRESHOLDS,
+            'pdf_min_confidence': PDF_MIN_CONFIDENCE,
+            'pdf_render': self.pdf_render_options,
+            'tiles': [self.tile_max_pixels, self.tile_size, self.tile_overlap],
+            'text_max_bytes': self.text_max_bytes,
+            'image_reduce': [self.image_target_text_height, self.image_reduce_min_pixels],
+            'blank_page_check': self.blank_page_check,
+            'coarse': [self.coarse_scale, self.coarse_refine_confidence],
+            'text_type': text_type,
+        }
+
+    def _extract_image(self, file_path, text_type="auto", backend=None, languages=None, reader_options=None):
+        """OCR تصویر؛ تصاویر بزرگ‌تر از tile_max_pixels کاشی‌به‌کاشی پردازش می‌شوند"""
+        # تصویر فقط یک بار (و برای JPEGهای بزرگ با وضوح کمتر) رمزگشایی می‌شود و تمام مراحل روی
+        # همان آرایه انجام می‌شود؛ تصویر بزرگ مسیر کاشی‌به‌کاشی از ابتدا خاکستری خوانده می‌شود
+        img = read_image_for_ocr(file_path, self.image_target_text_height, self.image_reduce_min_pixels,
+                                 self.tile_max_pixels)
+
+        # موتور فقط برای حالت 'detect' لازم است؛ در غیر این صورت موتوری ساخته یا برداشته نمی‌شود
+        blank_reader = self.get_backend(backend, languages, reader_options) \
+            if img is not None and self.blank_page_check == 'detect' else None
+        if img is not None and is_blank_page(img, blank_reader, self.blank_page_check):
+            print("⏭️ تصویر سفید است؛ OCR انجام نشد")
+            return {
+                'text': "📝 متنی در تصویر یافت نشد",
+                'type': 'blank',
+                'confidence': 0.0,
+                'file_type': 'image',
+                'skipped_pages': [1]
+            }
+
+        tiled = img is not None and img.shape[0] * img.shape[1] > self.tile_max_pixels
+        if tiled:
+            # اگر سرآیند تصویر خوانا نبود و رنگی رمزگشایی شد
+            img = to_gray(img)
+            print(f"پردازش کاشی‌به‌کاشی تصویر {img.shape[1]}x{img.shape[0]}")
+
+        # تشخیص نوع متن (برای تصویر بزرگ روی کاشی مرکزی)
+        if text_type == "auto":
+            if img is None:
+                final_text_type = "unknown"
+            else:
+                final_text_type = detect_text_type(center_crop(img, self.tile_size) if tiled else img)
+        else:
+            final_text_type = text_type
+
+        print(f"نوع متن: {final_text_type}")
+
+        # تنظیمات براساس نوع متن
+        if final_text_type == "handwritten":
+            text_threshold, low_text = TEXT_THRESHOLDS['handwritten']
+        else:
+            text_threshold, low_text = TEXT_THRESHOLDS['printed']
+
+        # مثلاً متن تایپی با Tesseract و دستنویس با EasyOCR
+        reader = self.readers.get(*self._reader_spec(final_text_type, backend, languages, reader_options))
+
+        if tiled:
+            results = ocr_image_tiled(
+                reader, img, self.tile_size, self.tile_overlap, self.tile_workers,
+                text_threshold=text_threshold, low_text=low_text
+            )
+        else:
+            # پیش‌پردازش ساده در حافظه
+            processed_img = simple_preprocess(img) if img is not None else None
+
+            if processed_img is not None:
+                ocr_input = processed_img
+            elif img is not None:
+                ocr_input = img
+            else:
+                # اگر رمزگشایی ممکن نبود، خواندن را به خود موتور OCR بسپار
+                ocr_input = file_path
+
+            if self.coarse_scale and img is not None and max(img.shape[:2]) > COARSE_MIN_SIDE:
+                results = ocr_image_coarse_to_fine(
+                    reader, ocr_input, self.coarse_scale, self.coarse_refine_confidence,
+                    text_threshold=text_threshold, low_text=low_text
+                )
+            else:
+                results = reader.readtext(
+                    ocr_input,
+                    detail=1,
+                    text_threshold=text_threshold,
+                    low_text=low_text
+                )
+
+        # فیلتر کردن نتایج
+        texts = []
+        confidences = []
+        for (bbox, text, confidence) in results:
+            if confidence > text_threshold and len(text.strip()) > 0:
+                texts.append(text)
+                confidences.append(confidence)
+
+        final_text = ' '.join(texts)
+        avg_confidence = float(np.mean(confidences)) if confidences else 0.0
+
+        return {
+            'text': final_text.strip() if final_text.strip() else "📝 متنی در تصویر یافت نشد",
+            'type': final_text_type,
+            'confidence': avg_confidence,
+            'file_type': 'image'
+        }
+
+    def extract_text(self, file_path, text_type="auto", completed_pages=None, on_page=None, backend=None,
+                     languages=None, reader_options=None):
+        """استخراج متن از انواع فایل‌ها
+
+        برای PDF و تصویر چندصفحه‌ای، completed_pages ({شماره صفحه: نتیجه‌ی صفحه}) صفحه‌های ثبت‌شده‌ی قبلی است که
+        دوباره پردازش نمی‌شوند و on_page(نتیجه‌ی صفحه) برای هر صفحه‌ی تازه صدا زده می‌شود
+        (نگاه کنید به iter_pages). backend، languages (مثلاً ['en']) و reader_options موتور OCR
+        همین درخواست را تعیین می‌کنند که از استخر موتورهای گرم برداشته می‌شود.
+        """
         try:
             file_type = detect_file_type(file_path)
             print(f"تشخیص نوع فایل: {file_type}")
 
             if file_type == 'pdf':
-                text = extract_text_from_pdf(file_path,self.reader)
-                return {
-                    'text': text if text.strip() else "📝 متنی در PDF یافت نشد",
-                    'type': 'pdf',
-                    'confidence': 1.0,
-                    'file_type': 'pdf'
-                }
+                result = self._extract_pages(
+                    self._iter_pdf_pages(file_path, completed_pages, backend, languages, reader_options),
+                    completed_pages, on_page, 'PDF'
+                )
+                result.setdefault('type', 'pdf')
+                result['file_type'] = 'pdf'
+                return result
 
             elif file_type == 'word':
                 text = extract_text_from_word(file_path)
@@ -249,7 +1232,7 @@ class UniversalOCR:
                 }
 
             elif file_type == 'text':
-                text = extract_text_from_text_file(file_path)
+                text = extract_text_from_text_file(file_path, self.text_max_bytes)
                 return {
                     'text': text if text.strip() else "📝 فایل متنی خالی است",
                     'type': 'text',
@@ -266,72 +1249,19 @@ class UniversalOCR:
                         'file_type': 'image'
                     }
 
-                # تشخیص نوع متن
-                if text_type == "auto":
-                    final_text_type = detect_text_type(file_path)
-                else:
-                    final_text_type = text_type
-
-                print(f"نوع متن: {final_text_type}")
-
-                # تنظیمات براساس نوع متن
-                if final_text_type == "handwritten":
-                    # برای دستنویس: آستانه پایین‌تر، حساسیت بیشتر
-                    text_threshold = 0.2
-                    low_text = 0.1
-                else:
-                    # برای تایپی: آستانه بالاتر، دقت بیشتر
-                    text_threshold = 0.4
-                    low_text = 0.3
-
-                # پیش‌پردازش ساده
-                processed_img = simple_preprocess(file_path)
-
-                if processed_img is not None:
-                    # ذخیره موقت تصویر پردازش شده
-                    temp_dir = tempfile.gettempdir()
-                    temp_path = os.path.join(temp_dir, f"processed_{os.getpid()}.png")
-                    cv2.imwrite(temp_path, processed_img)
-
-                    # پردازش با تصویر پیش‌پردازش شده
-                    results = self.reader.readtext(
-                        temp_path,
-                        detail=1,
-                        text_threshold=text_threshold,
-                        low_text=low_text
+                frame_count = image_frame_count(file_path)
+                if frame_count > 1:
+                    print(f"تصویر چندصفحه‌ای با {frame_count} صفحه")
+                    result = self._extract_pages(
+                        self._iter_frame_pages(file_path, completed_pages, backend, languages, reader_options),
+                        completed_pages, on_page,
+                        'تصویر چندصفحه‌ای'
                     )
+                    result.setdefault('type', 'multipage')
+                    result['file_type'] = 'image'
+                    return result
 
-                    # حذف فایل موقت
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-                else:
-                    # پردازش با تصویر اصلی
-                    results = self.reader.readtext(
-                        file_path,
-                        detail=1,
-                        text_threshold=text_threshold,
-                        low_text=low_text
-                    )
-
-                # فیلتر کردن نتایج
-                texts = []
-                confidences = []
-                for (bbox, text, confidence) in results:
-                    if confidence > text_threshold and len(text.strip()) > 0:
-                        texts.append(text)
-                        confidences.append(confidence)
-
-                final_text = ' '.join(texts)
-                avg_confidence = float(np.mean(confidences)) if confidences else 0.0
-
-                return {
-                    'text': final_text.strip() if final_text.strip() else "📝 متنی در تصویر یافت نشد",
-                    'type': final_text_type,
-                    'confidence': avg_confidence,
-                    'file_type': 'image'
-                }
+                return self._extract_image(file_path, text_type, backend, languages, reader_options)
 
             else:
                 return {
@@ -29,6 +29,7 @@ urlpatterns = [
     path('get-folder-contents/<int:folder_id>/', views.get_folder_contents, name='get_folder_contents'),
     path('search/', views.search_documents, name='search_documents'),
     path('document-content/<int:document_id>/', views.document_content, name='document_content'),
+    path('queue-status/<int:document_id>/', views.queue_status, name='queue_status'),
     path('get-root-contents/<int:person_id>/', views.get_root_contents, name='get_root_contents'),
     path('get-person-folders/<int:person_id>/', views.get_person_folders, name='get_person_folders'),
     path('login/', views.custom_login, name='login'),
@@ -8,7 +8,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.core.files.storage import FileSystemStorage
 from django.db.models import Q
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.csrf import csrf_exempt
 
@@ -18,16 +18,13 @@ from .decorators import (
     require_search_persons, require_search_documents, require_simple_ocr
 )
 from .models import Person, Folder, Document, ScanQueue, CustomUser, UserPermission
+from .engine import get_ocr_engine
+from .ocr_backends import BACKENDS
+from .ocr_cache import get_ocr_cache
+from .scan_queue import enqueue, queue_position
 
-try:
-    from .universal_ocr import UniversalOCR
-
-    ocr_engine = UniversalOCR()
-    OCR_AVAILABLE = True
-    print("✅ UniversalOCR با موفقیت لود شد")
-except ImportError as e:
-    print(f"❌ خطا در لود OCR: {e}")
-    OCR_AVAILABLE = False
+# نام‌های اولویت صف در درخواست آپلود
+PRIORITY_NAMES = {'normal': 0, 'high': 5, 'urgent': 10}
 
 
 @require_person_management
@@ -179,8 +176,29 @@ def extract_text(request):
             if not os.path.exists(file_path):
                 return JsonResponse({'error': 'فایل ذخیره نشد', 'status': 'error'})
 
-            if OCR_AVAILABLE:
-                result = ocr_engine.extract_text(file_path)
+            # انتخاب اختیاری موتور OCR برای همین درخواست
+            backend = request.POST.get('backend') or None
+            if backend is not None and backend not in BACKENDS:
+                fs.delete(filename)
+                return JsonResponse({'error': f'موتور OCR ناشناخته: {backend}', 'status': 'error'})
+
+            # زبان‌های اختیاری، مثلاً 'en' یا 'fa,en' (موتور همین زبان‌ها از استخر موتورها برداشته می‌شود)
+            languages = [code.strip() for code in request.POST.get('languages', '').split(',') if code.strip()]
+            if any(not code.isalnum() or len(code) > 10 for code in languages):
+                fs.delete(filename)
+                return JsonResponse({'error': 'کد زبان نامعتبر است', 'status': 'error'})
+            languages = languages or None
+
+            ocr_engine = get_ocr_engine()
+            if ocr_engine is not None and request.POST.get('stream'):
+                # هر صفحه در یک خط JSON به محض آماده شدن ارسال می‌شود
+                return StreamingHttpResponse(
+                    stream_pages(ocr_engine, fs, filename, backend, languages),
+                    content_type='application/x-ndjson'
+                )
+
+            if ocr_engine is not None:
+                result = get_ocr_cache().extract_text(ocr_engine, file_path, backend=backend, languages=languages)
                 response_data = {
                     'text': result['text'],
                     'type': result.get('type', 'unknown'),
@@ -188,6 +206,10 @@ def extract_text(request):
                     'confidence': round(result.get('confidence', 0), 2),
                     'status': 'success'
                 }
+                if result.get('skipped_pages'):
+                    # صفحه‌های سفیدی که بدون OCR رد شدند
+                    response_data['skipped_pages'] = result['skipped_pages']
+                    response_data['time_saved'] = result.get('time_saved', 0)
             else:
                 response_data = {
                     'text': "موتور OCR در دسترس نیست",
@@ -208,6 +230,21 @@ def extract_text(request):
     return JsonResponse({'error': 'فایلی ارسال نشده', 'status': 'error'})
 
 
+def stream_pages(ocr_engine, fs, filename, backend=None, languages=None):
+    """خطوط NDJSON صفحه‌ها و در پایان یک خط {'done': True}؛ فایل موقت در پایان حذف می‌شود"""
+    pages = 0
+    try:
+        for page in ocr_engine.iter_pages(fs.path(filename), backend=backend, languages=languages):
+            pages += 1
+            page['confidence'] = round(page['confidence'], 2)
+            yield json.dumps(page, ensure_ascii=False) + '\n'
+        yield json.dumps({'done': True, 'pages': pages, 'status': 'success'}) + '\n'
+    except Exception as e:
+        yield json.dumps({'done': True, 'error': str(e), 'status': 'error'}, ensure_ascii=False) + '\n'
+    finally:
+        fs.delete(filename)
+
+
 @csrf_exempt
 def get_root_contents(request, person_id):
     """دریافت محتوای ریشه (فایل‌های بدون پوشه و پوشه‌های اصلی)"""
@@ -275,11 +312,22 @@ def document_content(request, document_id):
         print(f"File path: {document.original_file.path}")
         print(f"File exists: {os.path.exists(document.original_file.path)}")
 
+    # برای سندهای در حال پردازش، متن صفحه‌های آماده‌شده نمایش داده می‌شود
+    extracted_text = document.extracted_text
+    partial = False
+    pages_ready = 0
+    if not document.ocr_processed and document.pages.exists():
+        extracted_text = document.partial_text()
+        partial = True
+        pages_ready = document.pages.count()
+
     # استفاده از propertyهای جدید
     return JsonResponse({
         'file_name': document.file_name,
         'description': document.description,
-        'extracted_text': document.extracted_text,
+        'extracted_text': extracted_text,
+        'partial': partial,
+        'pages_ready': pages_ready,
         'confidence': document.extraction_confidence,
         'processed': document.ocr_processed,  # استفاده از فیلد واقعی
         'ocr_processed': document.ocr_processed,  # برای سازگاری
@@ -369,6 +417,16 @@ def upload_documents(request, person_id):
         folder_id = request.POST.get('folder_id')
         description = request.POST.get('description', '')
 
+        # اولویت صف: عدد (0، 5، 10) یا نام ('normal'، 'high'، 'urgent')
+        priority = request.POST.get('priority', 0)
+        priority = PRIORITY_NAMES.get(priority, priority)
+        try:
+            priority = int(priority)
+        except (TypeError, ValueError):
+            priority = None
+        if priority not in dict(ScanQueue.PRIORITY_CHOICES):
+            return JsonResponse({'success': False, 'error': 'اولویت نامعتبر است'}, status=400)
+
         folder = None
         if folder_id:
             folder = get_object_or_404(Folder, id=folder_id, person=person)
@@ -384,20 +442,37 @@ def upload_documents(request, person_id):
                 description=description
             )
 
-            # اضافه کردن به صف اسکن
-            scan_queue = ScanQueue.objects.create(document=document)
-            document.scan_queue_position = ScanQueue.objects.filter(status='pending').count()
-            document.save()
+            # اضافه کردن به صف اسکن (workerهای منتظر بلافاصله بیدار می‌شوند)
+            item = enqueue(document, priority)
 
             results.append({
                 'document_id': document.id,
                 'file_name': document.file_name,
-                'queue_position': document.scan_queue_position
+                'queue_position': queue_position(item)
             })
 
         return JsonResponse({'success': True, 'documents': results})
 
 
+@require_document_view
+def queue_status(request, document_id):
+    """وضعیت و موقعیت زنده‌ی سند در صف اسکن"""
+    document = get_object_or_404(Document, id=document_id)
+    item = ScanQueue.objects.filter(document=document).order_by('-created_at').first()
+    if item is None:
+        return JsonResponse({'queued': False, 'processed': document.ocr_processed})
+
+    return JsonResponse({
+        'queued': True,
+        'status': item.status,
+        'priority': item.priority,
+        'lane': 'small' if item.size_lane == 0 else 'normal',
+        'queue_position': queue_position(item),
+        'pages_ready': document.pages.count(),
+        'processed': document.ocr_processed,
+    })
+
+
 def get_folder_contents(request, folder_id):
     """دریافت محتوای پوشه (زیرپوشه‌ها و فایل‌ها)"""
     folder = get_object_or_404(Folder, id=folder_id)
@@ -29,6 +29,123 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# تنظیمات موتور OCR (آرگومان‌های UniversalOCR)
+OCR_ENGINE_OPTIONS = {
+    # تعداد صفحه‌های اسکن‌شده‌ی PDF که با هم به OCR داده می‌شوند
+    'pdf_batch_size': 4,
+    # پردازش موازی PDFهای بزرگ (۱ = غیرفعال)
+    'pdf_workers': 1,
+    # سقف حافظه‌ی مقیم (RSS) هر پردازه (مگابایت، None = بدون سقف؛ نیازمند psutil) و نخ‌های torch
+    # هر پردازه؛ با عبور از سقف پردازه‌ها دوباره راه‌اندازی می‌شوند، و اگر خود موتور بیش از سقف
+    # حافظه بگیرد پردازش موازی غیرفعال می‌شود
+    'pdf_worker_max_memory_mb': None,
+    'pdf_worker_torch_threads': 1,
+    'pdf_parallel_min_pages': 16,
+    # وضوح رندر صفحه‌های اسکن‌شده: ارتفاع هدف متن (پیکسل)، سقف پیکسل هر صفحه
+    # و محدود کردن وضوح به وضوح تصویر اسکن‌شده‌ی درون صفحه
+    'pdf_target_text_height': 32,
+    'pdf_max_pixels': 12_000_000,
+    'pdf_use_image_resolution': True,
+    # برداشت مستقیم تصویر اسکن‌شده‌ی صفحه به‌جای رندر کل صفحه
+    'pdf_use_embedded_images': True,
+    # تصاویر بزرگ‌تر از tile_max_pixels به کاشی‌های هم‌پوشان تقسیم می‌شوند؛
+    # tile_workers تعداد کاشی‌هایی است که همزمان پردازش می‌شوند
+    'tile_max_pixels': 16_000_000,
+    'tile_size': 2048,
+    'tile_overlap': 256,
+    'tile_workers': 1,
+    # JPEGهای بزرگ‌تر از image_reduce_min_pixels با وضوح کمتر رمزگشایی می‌شوند تا جایی که
+    # ارتفاع متن از image_target_text_height پیکسل کمتر نشود (None = همیشه وضوح کامل)
+    'image_target_text_height': 32,
+    'image_reduce_min_pixels': 12_000_000,
+    # رد کردن صفحه‌های سفید پیش از OCR: 'ink' (صفحه‌های بدون جوهر، با چشم‌پوشی از لکه‌های ریز و
+    # حاشیه‌ی صفحه)، 'detect' (به‌علاوه‌ی اجرای فقط مدل تشخیص متن برای هر صفحه‌ی جوهردار) یا None
+    'blank_page_check': 'ink',
+    # حالت دومرحله‌ای برای تصاویر: خواندن کل تصویر با مقیاس coarse_scale (مثلاً 0.5) و بازخوانی
+    # نواحی با اطمینان کمتر از coarse_refine_confidence با وضوح کامل (None = غیرفعال)
+    'coarse_scale': None,
+    'coarse_refine_confidence': 0.6,
+    # سقف حجم خوانده‌شده از فایل‌های متنی (بایت، None = بدون سقف)
+    'text_max_bytes': 50 * 1024 * 1024,
+    # موتور پیش‌فرض: 'easyocr'، 'easyocr_onnx' (ONNX Runtime)، 'paddleocr' یا 'tesseract'
+    # (دقت و سرعت easyocr_onnx هنوز با manage.py ocr_benchmark روی نمونه‌های واقعی سنجیده نشده است)
+    'backend': 'easyocr',
+    # تنظیمات اختصاصی هر موتور، مثلاً {'tesseract': {'tesseract_cmd': '/usr/bin/tesseract'}}
+    # یا {'easyocr_onnx': {'quantize': True, 'intra_op_threads': 4}}
+    'backend_options': {},
+    # موتور براساس نوع سند: 'printed'، 'handwritten' و 'pdf'، مثلاً {'printed': 'tesseract'}
+    'backend_routing': {},
+    # زبان‌های پیش‌فرض موتورها (هر درخواست می‌تواند languages خودش را بدهد)
+    'languages': ['fa', 'en'],
+    # استخر موتورهای گرم براساس (موتور، زبان‌ها، تنظیمات): سقف حافظه (مگابایت) و تعداد؛
+    # با عبور از سقف، کم‌استفاده‌ترین موتور کنار گذاشته می‌شود (None = بدون سقف)
+    'reader_pool_memory_mb': 2048,
+    'reader_pool_size': 4,
+    # موتورهایی که هنگام ساخت موتور OCR پیشاپیش بارگذاری می‌شوند، مثلاً
+    # [{'backend': 'easyocr', 'languages': ['en']}]؛ هر موتور چند صد مگابایت به حافظه‌ی هر
+    # worker، نسخه‌ی سرویس و پردازه‌ی وب اضافه می‌کند
+    'reader_preload': [],
+}
+
+# سرویس ماندگار OCR (manage.py ocr_service)؛ در صورت فعال بودن، وب و workerها فقط کلاینت آن هستند
+OCR_SERVICE = {
+    'enabled': False,
+    'socket': os.path.join(BASE_DIR, 'ocr_service.sock'),
+    # تعداد نسخه‌های موتور OCR در سرویس (هر نسخه مدل‌های خودش را دارد)
+    'replicas': 1,
+    'timeout': 600,
+    # اگر سرویس در دسترس نبود، موتور در همان پردازه ساخته شود
+    'fallback_local': True,
+}
+
+# صف اسکن (ocr_app/scan_queue.py): هر worker آیتم را با اجاره برمی‌دارد و در طول پردازش
+# تمدید می‌کند؛ آیتم worker ازکارافتاده پس از پایان مهلت (ثانیه) دوباره برداشته می‌شود
+OCR_QUEUE = {
+    'lease_seconds': 300,
+    # آیتمی که این تعداد بار برداشته شده و باز هم اجاره‌اش منقضی شده ناموفق ثبت می‌شود
+    'max_attempts': 3,
+    # workerهای بیکار با اعلان افزودن آیتم بیدار می‌شوند (سوکت‌های محلی در این پوشه و روی
+    # PostgreSQL با LISTEN/NOTIFY)؛ بررسی دوره‌ای صف از حداقل تا حداکثر فاصله (ثانیه) دو برابر می‌شود
+    'wakeup_dir': os.path.join(BASE_DIR, 'ocr_queue_wakeup'),
+    'poll_min_seconds': 1,
+    'poll_max_seconds': 30,
+    # تعداد پردازه‌های worker (manage.py ocr_worker --concurrency) که با fork از یک والد، وزن‌های
+    # مدل را مشترک استفاده می‌کنند، و نخ‌های torch هر کدام (None = پیش‌فرض torch)
+    'concurrency': 1,
+    'threads_per_worker': None,
+    # فایل‌های تا این حجم (بایت) در مسیر فایل کوچک قرار می‌گیرند و در هر نوبت زودتر برداشته
+    # می‌شوند (ocr_worker --lane small یک worker اختصاصی این مسیر اجرا می‌کند)
+    'small_file_bytes': 1024 * 1024,
+}
+
+# مقیاس‌دهی خودکار workerها (manage.py ocr_autoscale) براساس طول صف و عمر قدیمی‌ترین آیتم؛
+# افزایش با فاصله‌ی scale_up_cooldown و کاهش پس از scale_down_delay ثانیه نیاز کمتر (ثانیه)،
+# و فقط اگر پردازنده و حافظه‌ی آزاد (مگابایت) کافی باشد
+OCR_AUTOSCALE = {
+    'min_workers': 1,
+    'max_workers': 4,
+    'items_per_worker': 10,
+    'max_wait_seconds': 120,
+    'scale_up_step': 2,
+    'scale_up_cooldown': 30,
+    'scale_down_delay': 300,
+    'max_cpu_percent': 90,
+    'min_available_memory_mb': 1024,
+    'interval': 10,
+    'threads_per_worker': None,
+}
+
+# سقف زمان راه‌اندازی لایه‌ی وب بدون بارگذاری موتور OCR (ثانیه؛ manage.py check_web_startup)
+OCR_WEB_STARTUP_BUDGET = 3.0
+
+# کش نتایج OCR براساس هش محتوای فایل و تنظیمات موتور
+OCR_CACHE = {
+    'enabled': True,
+    # سقف تعداد ورودی‌ها و حجم کل متن ذخیره‌شده (حذف LRU)
+    'max_entries': 10000,
+    'max_bytes': 200 * 1024 * 1024,
+}
+
 SECURE_REFERRER_POLICY = 'same-origin'
 AUTH_USER_MODEL = 'ocr_app.CustomUser'
 